@@ -1,5 +1,6 @@
 import sqlite3 
 import functools
+from query_cache import settle_writes, tables_written, track_tables
 
 """your code goes here"""
 def with_db_connection(func):
@@ -8,8 +9,11 @@ def with_db_connection(func):
     def wrapper(*args, **kwargs):
         conn = sqlite3.connect('users.db')
         try:
-            result = func(conn, *args, **kwargs)
+            with track_tables(conn) as access:
+                result = func(conn, *args, **kwargs)
         finally:
+            # Any write may have been committed; an extra invalidation is harmless.
+            tables_written(conn, access.written)
             conn.close()
         return result
     return wrapper
@@ -20,12 +24,17 @@ def transactional(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         conn = args[0]
-        try:
-            result = func(*args, **kwargs)
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
+        with track_tables(conn) as access:
+            try:
+                result = func(*args, **kwargs)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                settle_writes(conn, access.written)
+                raise e
+        # Only committed writes invalidate cached reads of those tables.
+        settle_writes(conn, access.written)
+        tables_written(conn, access.written)
         return result
     return wrapper
 
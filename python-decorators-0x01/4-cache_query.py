@@ -1,34 +1,66 @@
 import time
 import sqlite3 
 import functools
+from query_cache import (CACHE_PATH, database_path, make_key, open_cache, table_keys,
+                         tables_written, track_tables, MISSING)
 
 
-query_cache = {}
+# Shared between processes through a SQLite file when QUERY_CACHE_PATH is set.
+query_cache = open_cache(CACHE_PATH, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300)
 def with_db_connection(func):
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         conn = sqlite3.connect('users.db')
         try:
-            result = func(conn, *args, **kwargs)
+            with track_tables(conn) as access:
+                result = func(conn, *args, **kwargs)
         finally:
+            # Any write may have been committed; an extra invalidation is harmless.
+            tables_written(conn, access.written)
             conn.close()
         return result
     return wrapper
 
 """your code goes here"""
-def cache_query(func):
+def cache_query(func=None, ttl=None, cache=None):
+    """Cache results in query_cache, keyed on the SQL, its parameters and the database.
+
+    Each result depends on the tables the query read and is invalidated
+    when one of them is written. Use as @cache_query, or @cache_query(ttl=60)
+    to override the expiry; cache= takes any CacheBackend instead of query_cache.
+    Backends register their versions when created, so writes reach them too.
+    Inside a transaction with uncommitted writes the cache is not used.
+    """
+    if func is None:
+        return lambda func: cache_query(func, ttl, cache)
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        conn = args[0] if args else kwargs["conn"]
         query = args[1] if len(args) > 1 else kwargs.get("query", "")
-        if query in query_cache:
+        params = args[2] if len(args) > 2 else kwargs.get("params", ())
+        store = cache if cache is not None else query_cache
+        if conn.in_transaction:
+            # Pending writes are visible here but may still be rolled back,
+            # and a cached result would hide them, so bypass the cache.
+            print(f"[CACHE] Bypassing cache inside an open transaction for query: {query}")
+            return func(*args, **kwargs)
+        key = make_key(query, params, database_path(conn))
+        result = store.get(key)
+        if result is not MISSING:
             print(f"[CACHE] Using cached result for query: {query}")
-            return query_cache[query]
-        else:
-            print(f"[CACHE] Executing and caching result for query: {query}")
+            return result
+        print(f"[CACHE] Executing and caching result for query: {query}")
+        before = store.versions.snapshot()
+        with track_tables(conn) as access:
             result = func(*args, **kwargs)
-            query_cache[query] = result
+        if access.written:
+            tables_written(conn, access.written)
             return result
+        depends_on = {table: before.get(table, 0) for table in table_keys(conn, access.read)}
+        store.set(key, result, ttl, depends_on)
+        return result
     return wrapper
 
 @with_db_connection
@@ -0,0 +1,625 @@
+import os
+import re
+import sys
+import time
+import json
+import zlib
+import base64
+import hashlib
+import sqlite3
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from collections import OrderedDict
+
+MISSING = object()
+# Quoted literals are kept verbatim; only whitespace between them is folded.
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+
+def normalize_sql(sql):
+    """Fold runs of whitespace and drop a trailing semicolon."""
+    parts = _QUOTED.split(sql)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return "".join(parts).strip().rstrip(";").rstrip()
+
+
+def database_path(conn):
+    """Return the file behind a sqlite3 connection's main database.
+
+    In-memory databases are private to their connection, so they get a
+    name unique to it.
+    """
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return path or f":memory:{id(conn)}"
+    return f":memory:{id(conn)}"
+
+
+def make_key(sql, params=(), database=""):
+    """Build a cache key from normalized SQL, bound parameters and database."""
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    return (database, normalize_sql(sql), tuple(params or ()))
+
+
+def estimate_size(value):
+    """Approximate memory used by a query result, in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return size
+
+
+class TableVersions:
+    """Per-table write counters for one process.
+
+    Keys are (database path, table name) pairs. A cached result remembers
+    the versions of the tables it read and is stale once any has moved on.
+    """
+
+    def __init__(self):
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def snapshot(self, keys=None):
+        """Return {key: version} for keys, or for every table written so far."""
+        with self.lock:
+            if keys is None:
+                return dict(self.versions)
+            return {key: self.versions.get(key, 0) for key in keys}
+
+    def bump(self, keys):
+        """Record a committed write to each table in keys."""
+        with self.lock:
+            for key in keys:
+                self.versions[key] = self.versions.get(key, 0) + 1
+
+
+def _to_json(value):
+    if isinstance(value, tuple):
+        return {"t": [_to_json(item) for item in value]}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {"d": [[_to_json(k), _to_json(v)] for k, v in value.items()]}
+    if isinstance(value, bytes):
+        return {"b": base64.b64encode(value).decode("ascii")}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"Cannot cache a {type(value).__name__}")
+
+
+def _from_json(value):
+    if isinstance(value, list):
+        return [_from_json(item) for item in value]
+    if isinstance(value, dict):
+        if "t" in value:
+            return tuple(_from_json(item) for item in value["t"])
+        if "d" in value:
+            return {_from_json(k): _from_json(v) for k, v in value["d"]}
+        return base64.b64decode(value["b"])
+    return value
+
+
+def encode_result(value):
+    """Serialize a query result to JSON bytes.
+
+    Only the types sqlite3 rows are made of (None, numbers, str, bytes) in
+    lists, tuples and dicts are supported, so decoding a tampered file can
+    at worst return wrong data, never run code. Raises TypeError otherwise.
+    """
+    return json.dumps(_to_json(value), separators=(",", ":")).encode()
+
+
+def decode_result(blob):
+    """Inverse of encode_result()."""
+    return _from_json(json.loads(blob))
+
+
+class _SqliteStore:
+    """Opens one connection to a WAL-mode SQLite file per thread and process.
+
+    The file is created readable by its owner only, and a file owned by
+    another user is refused, since whoever can write it decides what every
+    process sharing it reads back.
+    """
+
+    SCHEMA = ()
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.local = threading.local()
+
+    def _check_owner(self):
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, mode=0o700)
+        # sqlite gives the -wal and -shm files the main file's permissions.
+        os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+        if hasattr(os, "getuid") and os.stat(self.path).st_uid != os.getuid():
+            raise PermissionError(f"{self.path} is owned by another user")
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            self._check_owner()
+            # Autocommit mode; writes open their own BEGIN IMMEDIATE.
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def write(self):
+        """Context manager running a write transaction that other processes see whole."""
+        return _Transaction(self.connection())
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class SqliteTableVersions(_SqliteStore):
+    """TableVersions kept in a SQLite file, shared by every process on the host."""
+
+    SCHEMA = ("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            database TEXT NOT NULL,
+            name TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (database, name)
+        )
+    """,)
+
+    def snapshot(self, keys=None):
+        conn = self.connection()
+        if keys is None:
+            rows = conn.execute("SELECT database, name, version FROM table_versions")
+            return {(database, name): version for database, name, version in rows}
+        versions = {}
+        for database, name in keys:
+            row = conn.execute(
+                "SELECT version FROM table_versions WHERE database = ? AND name = ?",
+                (database, name)).fetchone()
+            versions[(database, name)] = row[0] if row else 0
+        return versions
+
+    def bump(self, keys):
+        with self.write() as conn:
+            conn.executemany("""
+                INSERT INTO table_versions (database, name, version) VALUES (?, ?, 1)
+                ON CONFLICT (database, name) DO UPDATE SET version = version + 1
+            """, list(keys))
+
+
+# Processes that set QUERY_CACHE_PATH share table versions (and, through
+# open_cache, cached results) in that file; otherwise both are per process.
+CACHE_PATH = os.getenv("QUERY_CACHE_PATH")
+table_versions = SqliteTableVersions(CACHE_PATH) if CACHE_PATH else TableVersions()
+
+
+class TableAccess:
+    """Tables read and written while a track_tables() block was active."""
+
+    def __init__(self):
+        self.read = set()
+        self.written = set()
+
+
+_WRITE_ACTIONS = {
+    sqlite3.SQLITE_INSERT: 0,
+    sqlite3.SQLITE_UPDATE: 0,
+    sqlite3.SQLITE_DELETE: 0,
+    sqlite3.SQLITE_DROP_TABLE: 0,
+    sqlite3.SQLITE_ALTER_TABLE: 1,
+}
+_tracking = {}
+
+
+def _authorizer(trackers):
+    def authorize(action, arg1, arg2, database, trigger):
+        if action == sqlite3.SQLITE_READ:
+            table, written = arg1, False
+        elif action in _WRITE_ACTIONS:
+            table, written = (arg1, arg2)[_WRITE_ACTIONS[action]], True
+        else:
+            return sqlite3.SQLITE_OK
+        if table and not table.startswith("sqlite_"):
+            for access in trackers:
+                (access.written if written else access.read).add(table)
+        return sqlite3.SQLITE_OK
+    return authorize
+
+
+@contextmanager
+def track_tables(conn):
+    """Record the tables the connection reads and writes inside the block.
+
+    Uses the sqlite3 authorizer callback. It only runs while a statement is
+    prepared, so it is re-installed on entry, which also expires statements
+    cached earlier. Blocks may nest.
+    """
+    access = TableAccess()
+    trackers = _tracking.setdefault(conn, [])
+    trackers.append(access)
+    conn.set_authorizer(_authorizer(trackers))
+    try:
+        yield access
+    finally:
+        trackers.remove(access)
+        if trackers:
+            conn.set_authorizer(_authorizer(trackers))
+        else:
+            conn.set_authorizer(None)
+            del _tracking[conn]
+
+
+def settle_writes(conn, tables):
+    """Forget writes to tables that a transaction has committed or rolled back.
+
+    Enclosing track_tables() blocks on conn stop reporting them, so an outer
+    with_db_connection does not invalidate again after a rollback.
+    """
+    for access in _tracking.get(conn, ()):
+        access.written.difference_update(tables)
+
+
+def table_keys(conn, tables):
+    """Qualify table names with the connection's database path."""
+    database = database_path(conn)
+    return {(database, table) for table in tables}
+
+
+# Versions of every live cache backend, keyed so that stores sharing a file
+# are bumped once. Backends register in __init__ (see register_versions).
+_backend_versions = weakref.WeakValueDictionary()
+
+
+def _versions_id(versions):
+    return getattr(versions, "path", None) or id(versions)
+
+
+def register_versions(versions):
+    """Have tables_written() bump versions as well as table_versions."""
+    _backend_versions[_versions_id(versions)] = versions
+    return versions
+
+
+def tables_written(conn, tables, versions=None):
+    """Bump the versions of tables the connection has written.
+
+    Without versions, every registered backend's versions are bumped along
+    with table_versions, so caches passed to cache_query(cache=...) are
+    invalidated too.
+    """
+    if not tables:
+        return
+    keys = table_keys(conn, tables)
+    if versions is not None:
+        versions.bump(keys)
+        return
+    stores = {_versions_id(table_versions): table_versions}
+    for store in list(_backend_versions.values()):
+        stores.setdefault(_versions_id(store), store)
+    for store in stores.values():
+        store.bump(keys)
+
+
+class CacheBackend(ABC):
+    """Interface cache_query relies on; see QueryCache and SqliteCache.
+
+    Keys come from make_key(). A backend's versions attribute is the
+    TableVersions its depends_on snapshots are checked against.
+    """
+
+    versions = None
+
+    @abstractmethod
+    def get(self, key, default=MISSING, count=True):
+        """Return the cached result for key, or default on a miss."""
+
+    @abstractmethod
+    def set(self, key, value, ttl=None, depends_on=None):
+        """Store a result, returning False if it was too large to keep."""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove the entry for key, if any."""
+
+    @abstractmethod
+    def clear(self):
+        """Remove every entry."""
+
+    @abstractmethod
+    def stats(self):
+        """Return a dict of entry counts, sizes and hit/miss counters."""
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not MISSING
+
+
+class QueryCache(CacheBackend):
+    """In-memory LRU cache for query results.
+
+    Holds at most max_entries results and max_bytes of estimated result
+    size, evicting the least recently used first. Entries expire ttl
+    seconds after they are stored (None keeps them until evicted). Entries
+    stored with depends_on are dropped on lookup once one of those tables
+    has been written (see TableVersions).
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300,
+                 versions=None):
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("max_entries and max_bytes must be at least 1")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.versions = register_versions(versions or table_versions)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=MISSING, count=True):
+        """Return the cached result for key, or default on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            elif entry is not None and entry[3] and self.versions.snapshot(entry[3]) != entry[3]:
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None, depends_on=None):
+        """Store a result; ttl overrides the cache's default for this entry.
+
+        depends_on maps the table keys the result was read from to their
+        versions, taken before the query ran. Returns False if the result
+        alone is larger than max_bytes.
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return False
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, size, expires, depends_on or None)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+        return True
+
+    def _remove(self, key):
+        size = self.entries.pop(key)[1]
+        self.bytes -= size
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Return the entry count, bytes used and hit/miss/eviction counters."""
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class SqliteCache(_SqliteStore, CacheBackend):
+    """Query cache in a SQLite file, shared by every process on the host.
+
+    Results are stored with encode_result(), which only accepts sqlite3 row
+    values, and zlib-compressed above compress_over bytes. Each
+    set() is one IMMEDIATE transaction and the file runs in WAL mode, so
+    readers never see a partial entry and do not block the writer. Once
+    max_entries or max_bytes (of stored blobs) is exceeded, the least
+    recently used entries are deleted in the same transaction. Table
+    versions live in the same file, so a write committed by any process
+    invalidates results cached by all of them. Hit and miss counters are
+    per process.
+    """
+
+    SCHEMA = ("""
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            compressed INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            expires REAL,
+            depends_on BLOB,
+            last_used REAL NOT NULL
+        )
+    """, "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+    SCHEMA += SqliteTableVersions.SCHEMA
+
+    def __init__(self, path="query_cache.db", max_entries=10_000,
+                 max_bytes=256 * 1024 * 1024, ttl=300, compress_over=4096):
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("max_entries and max_bytes must be at least 1")
+        super().__init__(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compress_over = compress_over
+        self.versions = register_versions(SqliteTableVersions(path))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _digest(key):
+        # repr() of the SQL and plain parameter values is stable across
+        # processes, unlike hash() of str.
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def __len__(self):
+        return self.connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, key, default=MISSING, count=True):
+        digest = self._digest(key)
+        conn = self.connection()
+        row = conn.execute(
+            "SELECT value, compressed, expires, depends_on, last_used FROM entries WHERE key = ?",
+            (digest,)).fetchone()
+        now = time.time()
+        result = MISSING
+        if row is not None:
+            value, compressed, expires, depends_on, last_used = row
+            try:
+                result = decode_result(zlib.decompress(value) if compressed else value)
+                if depends_on is not None:
+                    depends_on = {(database, name): version for database, name, version
+                                  in json.loads(depends_on)}
+            except (ValueError, zlib.error):
+                # Written in another format (older versions pickled entries).
+                self.delete(key)
+                result = MISSING
+            else:
+                if expires is not None and expires <= now:
+                    self.delete(key)
+                    self.expirations += 1
+                    result = MISSING
+                elif depends_on and self.versions.snapshot(depends_on) != depends_on:
+                    self.delete(key)
+                    self.invalidations += 1
+                    result = MISSING
+        if result is MISSING:
+            if count:
+                self.misses += 1
+            return default
+        if now - last_used > 1:
+            # Recency only needs to be coarse; this keeps most hits read-only.
+            with self.write() as conn:
+                conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, digest))
+        if count:
+            self.hits += 1
+        return result
+
+    def set(self, key, value, ttl=None, depends_on=None):
+        """Store a result, returning False if it is too large or not encodable."""
+        try:
+            blob = encode_result(value)
+        except TypeError:
+            return False
+        compressed = len(blob) > self.compress_over
+        if compressed:
+            blob = zlib.compress(blob, 1)
+        if len(blob) > self.max_bytes:
+            return False
+        ttl = self.ttl if ttl is None else ttl
+        with self.write() as conn:
+            # Timestamp after taking the lock, so recency follows commit order.
+            now = time.time()
+            conn.execute("""
+                INSERT OR REPLACE INTO entries
+                    (key, value, compressed, size, expires, depends_on, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (self._digest(key), blob, compressed, len(blob), now + ttl if ttl else None,
+                  json.dumps([[*table, version] for table, version in depends_on.items()])
+                  if depends_on else None, now))
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            if entries > self.max_entries or size > self.max_bytes:
+                # Keep the most recently used entries that fit both budgets.
+                evicted = conn.execute("""
+                    DELETE FROM entries WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key,
+                                   SUM(size) OVER recent AS kept_bytes,
+                                   ROW_NUMBER() OVER recent AS kept_entries
+                            FROM entries
+                            WINDOW recent AS (ORDER BY last_used DESC, key)
+                        ) WHERE kept_bytes > ? OR kept_entries > ?
+                    )
+                """, (self.max_bytes, self.max_entries)).rowcount
+                self.evictions += evicted
+        return True
+
+    def delete(self, key):
+        with self.write() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (self._digest(key),))
+
+    def clear(self):
+        with self.write() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def stats(self):
+        """Shared entry count and bytes, plus this process's counters."""
+        entries, size = self.connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def open_cache(path=None, **kwargs):
+    """Return a SqliteCache at path, or an in-memory QueryCache without one.
+
+    With a path, this process's writes are recorded in the cache file from
+    then on. Processes that write without opening the cache should set
+    QUERY_CACHE_PATH to the same path.
+    """
+    global table_versions
+    if path is None:
+        return QueryCache(**kwargs)
+    cache = SqliteCache(path, **kwargs)
+    table_versions = cache.versions
+    return cache
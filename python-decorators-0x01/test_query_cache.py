@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Module for testing the query result cache and its invalidation.
+"""
+import io
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import subprocess
+import contextlib
+from unittest import mock
+
+import query_cache
+from query_cache import QueryCache, SqliteCache, MISSING
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def quietly(func, *args, **kwargs):
+    """Call func with the decorators' progress messages suppressed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def setUpModule():
+    """Run the tests in a temporary directory holding a fresh users.db."""
+    global CWD, TMP
+    CWD = os.getcwd()
+    TMP = tempfile.mkdtemp()
+    os.chdir(TMP)
+    # The modules run their examples against users.db on import.
+    for name in ("setup_db", "2-transactional", "4-cache_query"):
+        quietly(__import__, name)
+
+
+def tearDownModule():
+    os.chdir(CWD)
+    shutil.rmtree(TMP)
+
+
+class CacheTestCase(unittest.TestCase):
+    """Helpers running cached reads and transactional writes on users.db"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = TMP
+        cls.transactional = sys.modules["2-transactional"]
+        cls.cache_query = sys.modules["4-cache_query"]
+
+    def count_users(self, cache):
+        """Return a users COUNT(*) function cached in cache."""
+        @self.cache_query.with_db_connection
+        @self.cache_query.cache_query(cache=cache)
+        def count(conn, query):
+            return conn.execute(query).fetchall()
+        return lambda: quietly(count, query="SELECT COUNT(*) FROM users")
+
+    def add_user(self, name, fail=False):
+        """Insert a user inside transactional, raising afterwards if fail."""
+        @self.transactional.with_db_connection
+        @self.transactional.transactional
+        def add(conn):
+            conn.execute("INSERT INTO users (name, email) VALUES (?, ?)",
+                         (name, f"{name}@example.com"))
+            if fail:
+                raise RuntimeError("abort")
+        add()
+
+
+class TestInvalidation(CacheTestCase):
+    """Tests that writes invalidate exactly the results they affect"""
+
+    def test_transactional_write_invalidates(self):
+        """Test that a committed write drops results of both backends"""
+        for cache in (QueryCache(), SqliteCache(os.path.join(self.tmp, "a.db"))):
+            count = self.count_users(cache)
+            before = count()[0][0]
+            self.assertEqual(count()[0][0], before)
+            self.add_user(f"writer{id(cache)}")
+            self.assertEqual(count()[0][0], before + 1)
+            self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_rollback_keeps_cached_result(self):
+        """Test that a rolled back write does not invalidate"""
+        cache = QueryCache()
+        count = self.count_users(cache)
+        before = count()
+        with self.assertRaises(RuntimeError):
+            self.add_user("rolled_back", fail=True)
+        self.assertEqual(count(), before)
+        self.assertEqual(cache.stats()["invalidations"], 0)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_no_caching_inside_open_transaction(self):
+        """Test that uncommitted reads are neither cached nor served after rollback"""
+        cache = QueryCache()
+        count = self.count_users(cache)
+        committed = count()
+        cache.clear()
+
+        @self.transactional.with_db_connection
+        @self.transactional.transactional
+        def add_and_count(conn):
+            conn.execute("INSERT INTO users (name, email) VALUES ('pending', 'pending@x.com')")
+            inside = quietly(self.cache_query.cache_query(cache=cache)(
+                lambda conn, query: conn.execute(query).fetchall()),
+                conn, "SELECT COUNT(*) FROM users")
+            self.assertEqual(inside[0][0], committed[0][0] + 1)
+            raise RuntimeError("abort")
+
+        with self.assertRaises(RuntimeError):
+            add_and_count()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(count(), committed)
+
+
+class TestExpiryAndEviction(unittest.TestCase):
+    """Tests TTL expiry and the entry and byte budgets"""
+
+    def test_ttl_expiry(self):
+        """Test that entries expire ttl seconds after they are stored"""
+        cache = QueryCache(ttl=10)
+        with mock.patch.object(query_cache.time, "monotonic", return_value=100.0) as clock:
+            cache.set("short", 1)
+            cache.set("long", 2, ttl=60)
+            clock.return_value = 111.0
+            self.assertIs(cache.get("short"), MISSING)
+            self.assertEqual(cache.get("long"), 2)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_sqlite_ttl_expiry(self):
+        """Test that shared entries expire by wall-clock time"""
+        cache = SqliteCache(os.path.join(tempfile.mkdtemp(), "c.db"), ttl=10)
+        self.addCleanup(shutil.rmtree, os.path.dirname(cache.path))
+        with mock.patch.object(query_cache.time, "time", return_value=100.0) as clock:
+            cache.set("key", [(1,)])
+            self.assertEqual(cache.get("key"), [(1,)])
+            clock.return_value = 111.0
+            self.assertIs(cache.get("key"), MISSING)
+
+    def test_entry_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = QueryCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertNotIn("b", cache)
+        self.assertIn("a", cache)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_byte_eviction(self):
+        """Test the byte budget and that oversized results are refused"""
+        value = [(i, "x" * 100) for i in range(10)]
+        size = query_cache.estimate_size(value)
+        cache = QueryCache(max_bytes=size * 2)
+        for key in "abc":
+            cache.set(key, list(value))
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.stats()["bytes"], size * 2)
+        self.assertFalse(cache.set("huge", value * 3))
+
+    def test_sqlite_eviction(self):
+        """Test that shared entries are evicted to both budgets"""
+        path = os.path.join(tempfile.mkdtemp(), "c.db")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        cache = SqliteCache(path, max_entries=3, max_bytes=10_000, compress_over=10**9)
+        for i in range(5):
+            with mock.patch.object(query_cache.time, "time", return_value=100.0 + i):
+                cache.set(i, [(i, "x" * 100)])
+        self.assertEqual(len(cache), 3)
+        self.assertIs(cache.get(0), MISSING)
+        cache.set("big", ["x" * 9_900])
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.stats()["evictions"], 5)
+
+
+class TestSharedCache(CacheTestCase):
+    """Tests two processes sharing one QUERY_CACHE_PATH"""
+
+    def test_second_process(self):
+        """Test that another process reads cached results and invalidates them"""
+        path = os.path.join(self.tmp, "shared", "cache.db")
+        cache = SqliteCache(path)
+        count = self.count_users(cache)
+        result = count()
+        key = query_cache.make_key("SELECT COUNT(*) FROM users", (),
+                                   os.path.abspath("users.db"))
+        child = (
+            "import io, contextlib, query_cache\n"
+            "cache = query_cache.open_cache(query_cache.CACHE_PATH)\n"
+            f"print(cache.get({key!r}, None))\n"
+            "with contextlib.redirect_stdout(io.StringIO()):\n"
+            "    __import__('2-transactional')\n"
+        )
+        env = dict(os.environ, QUERY_CACHE_PATH=path,
+                   PYTHONPATH=os.pathsep.join(filter(None, [HERE, os.getenv("PYTHONPATH")])))
+        output = subprocess.run([sys.executable, "-c", child], cwd=self.tmp, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), repr(result))
+        self.assertIs(cache.get(key), MISSING)
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_rejects_file_of_another_user(self):
+        """Test that a cache file owned by someone else is refused"""
+        path = os.path.join(self.tmp, "other.db")
+        sqlite3.connect(path).close()
+        with mock.patch.object(query_cache.os, "getuid", return_value=os.getuid() + 1):
+            with self.assertRaises(PermissionError):
+                len(SqliteCache(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
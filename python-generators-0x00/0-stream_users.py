@@ -1,22 +1,23 @@
-import os
-import mysql.connector
-from dotenv import load_dotenv
+from query import UserQuery
+from rows import get_decoder
 
-load_dotenv()
 
-def stream_users():
-    """Generator to fetch user_data rows one by one."""
-    connection = mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST"),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data")
+def stream_users(fetch_size=1000, row_format="dict", query=None):
+    """Generator to fetch user_data rows one by one.
 
-    for row in cursor:
-        yield row
+    The cursor is unbuffered, so rows stay on the server until they are
+    pulled fetch_size at a time and memory use does not grow with the table.
+    row_format picks dict or plain tuple rows, or the compact "namedtuple"
+    and "slots" records whose age is a native int or float.
+    Pass a UserQuery to stream a filtered or projected subset instead.
+    """
+    query = query or UserQuery()
+    decode = get_decoder(row_format, query.columns)
+    if fetch_size < 1:
+        raise ValueError("fetch_size must be at least 1")
 
-    cursor.close()
-    connection.close()
\ No newline at end of file
+    rows = query.stream(fetch_size, dictionary=row_format == "dict")
+    if decode is None:
+        yield from rows
+    else:
+        yield from map(decode, rows)
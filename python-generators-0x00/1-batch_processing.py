@@ -1,34 +1,88 @@
-import os
-import mysql.connector
-from dotenv import load_dotenv
-
-load_dotenv()
-
-
-def stream_users_in_batches(batch_size):
-    """Generator to yield user_data rows in batches."""
-    connection = mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST"),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data")
-
-    while True:
-        batch = cursor.fetchmany(batch_size)
-        if not batch:
-            break
+from contextlib import closing
+from query import UserQuery
+from prefetch import prefetch
+from rows import get_decoder
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def to_columns(column_names, rows, fixed_width=False, age_dtype="float64"):
+    """Transpose a batch of tuple rows into a dict of NumPy column arrays.
+
+    Ages become a numeric array of age_dtype; string columns are object
+    arrays, or fixed-width unicode arrays when fixed_width is set.
+    """
+    columns = {}
+    for name, values in zip(column_names, zip(*rows)):
+        if name == "age":
+            columns[name] = np.fromiter(values, dtype=age_dtype, count=len(values))
+        else:
+            columns[name] = np.array(values, dtype=str if fixed_width else object)
+    return columns
+
+
+def stream_users_in_batches(batch_size, columnar=False, fixed_width=False, query=None,
+                            row_format="dict"):
+    """Generator to yield user_data rows in batches.
+
+    With columnar=True each batch is a dict of NumPy arrays, one per column;
+    otherwise rows come in the given row_format (see rows.ROW_FORMATS).
+    Pass a UserQuery to push filters and column projection into SQL.
+    """
+    if columnar and np is None:
+        raise ImportError("NumPy is required for columnar batches")
+
+    query = query or UserQuery()
+    decode = None if columnar else get_decoder(row_format, query.columns)
+    dictionary = not columnar and row_format == "dict"
+    for batch in query.batches(batch_size, dictionary=dictionary):
+        if columnar:
+            batch = to_columns(query.columns, batch, fixed_width)
+        elif decode is not None:
+            batch = [decode(row) for row in batch]
         yield batch
 
-    cursor.close()
-    connection.close()
 
+def batch_processing(batch_size, vectorized=False, read_ahead=0, sink=None):
+    """Processes and prints users over age 25 from each batch.
+
+    The age filter runs in SQL; the Python-side check is kept as a guard.
+    With read_ahead > 0 that many batches are fetched in the background
+    while the current one is printed. Pass a sink (see sinks.py) to write
+    whole batches through a buffered NDJSON, CSV or columnar writer instead
+    of printing row by row; the scan stops once the sink's reader has gone
+    away (sink.broken_pipe).
+    """
+    query = UserQuery().where("age", ">", 25)
+
+    def batches(**kwargs):
+        stream = stream_users_in_batches(batch_size, query=query, **kwargs)
+        return prefetch(stream, read_ahead) if read_ahead else stream
+
+    # closing() ends the scan, and gives its connection back, on an early stop.
+    with closing(batches(columnar=vectorized)) as stream:
+        for batch in stream:
+            if vectorized:
+                mask = batch["age"] > 25
+                selected = {name: column[mask] for name, column in batch.items()}
+            else:
+                selected = [user for user in batch if user['age'] > 25]
+            if sink is not None:
+                sink.write(selected)
+                if sink.broken_pipe:
+                    # Nobody reads the output any more; stop scanning the table.
+                    break
+                continue
+            if vectorized:
+                selected = {name: column.tolist() for name, column in selected.items()}
+                for values in zip(*selected.values()):
+                    print(dict(zip(selected, values)))
+            else:
+                for user in selected:
+                    print(user)
 
-def batch_processing(batch_size):
-    """Processes and prints users over age 25 from each batch."""
-    for batch in stream_users_in_batches(batch_size):
-        for user in batch:
-            if user['age'] > 25:
-                print(user)
+    if sink is not None:
+        sink.finish()
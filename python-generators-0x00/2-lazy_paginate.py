@@ -1,28 +1,87 @@
-import os
-import mysql.connector
-from dotenv import load_dotenv
-
-load_dotenv()
+import json
+import base64
+from query import COLUMNS, UNIQUE_KEYS, USER_COLUMNS, UserQuery
 
 
 def paginate_users(page_size, offset):
     """Fetch a single page of users starting at a given offset."""
-    connection = mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST"),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data LIMIT %s OFFSET %s", (page_size, offset))
-    result = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    return result
-
-
-def lazy_paginate(page_size):
+    return UserQuery().limit(page_size, offset).fetch_all()
+
+
+def seek_columns(key):
+    """Return the ordering columns for a seek key, with user_id as tie-breaker."""
+    if key not in COLUMNS:
+        raise ValueError(f"Unknown seek key: {key}")
+    if key in UNIQUE_KEYS:
+        return (key,)
+    return (key, "user_id")
+
+
+def encode_cursor(key, after):
+    """Encode the last seen key values of a page into an opaque cursor token."""
+    payload = json.dumps({"key": key, "after": list(after)}, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(token):
+    """Decode a cursor token back into its seek key and last seen values."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return payload["key"], payload["after"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(f"Invalid cursor token: {token!r}")
+
+
+def keyset_query(page_size, after=None, key="user_id"):
+    """Build the query for the page of users that follows the given key values."""
+    columns = seek_columns(key)
+    query = UserQuery().order_by(*columns).limit(page_size)
+    extra = tuple(c for c in columns if c not in USER_COLUMNS)
+    if extra:
+        query = query.select(*USER_COLUMNS, *extra)
+    if after is not None:
+        query = query.after(columns, after)
+    return query
+
+
+def paginate_users_after(page_size, after=None, key="user_id"):
+    """Fetch the page of users that follows the given key values.
+
+    Seeks on the (indexed) ordering key instead of skipping rows, so every
+    page costs the same no matter how deep into the table it is.
+    """
+    return keyset_query(page_size, after, key).fetch_all()
+
+
+def lazy_paginate_keyset(page_size, cursor=None, key="user_id"):
+    """Generator yielding (page, cursor) pairs using keyset pagination.
+
+    Pass a cursor from a previous run to resume right after that page.
+    """
+    after = None
+    if cursor is not None:
+        token_key, after = decode_cursor(cursor)
+        if token_key != key:
+            raise ValueError(f"Cursor was issued for key {token_key!r}, not {key!r}")
+
+    columns = seek_columns(key)
+    while True:
+        page = paginate_users_after(page_size, after, key)
+        if not page:
+            break
+        after = [page[-1][column] for column in columns]
+        yield page, encode_cursor(key, after)
+        if len(page) < page_size:
+            break
+
+
+def lazy_paginate(page_size, keyset=False):
     """Generator to lazily fetch pages of users from the database."""
+    if keyset:
+        for page, _ in lazy_paginate_keyset(page_size):
+            yield page
+        return
+
     offset = 0
     while True:
         page = paginate_users(page_size, offset)
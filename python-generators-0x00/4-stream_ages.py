@@ -1,36 +1,64 @@
-import os
-import mysql.connector
-from dotenv import load_dotenv
-
-load_dotenv()
+from query import UserQuery
+from stats import StreamingStats, merge_stats, partition_stats, sql_aggregates
+from parallel_scan import parallel_reduce
+from incremental import incremental_age_stats
+from snapshot import open_snapshot
+from sampling import approximate_average_age
 
 
 def stream_user_ages():
     """Generator to yield user ages one by one."""
-    connection = mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST"),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor()
-    cursor.execute("SELECT age FROM user_data")
-
-    for (age,) in cursor:
+    for (age,) in UserQuery().select("age").stream(dictionary=False):
         yield age
 
-    cursor.close()
-    connection.close()
 
+def compute_average_age(pushdown=False, workers=None, state_path=None,
+                        snapshot_path=None, sample=None):
+    """Compute average age using the generator.
 
-def compute_average_age():
-    """Compute average age using the generator."""
-    total_age = 0
-    count = 0
+    With pushdown=True the exact COUNT and AVG are computed by MySQL instead;
+    with workers set, user_data is scanned in that many parallel partitions.
+    With state_path set, only rows added since the last run are read and
+    folded into the statistics saved there. With snapshot_path set, ages
+    are read from a memory-mapped snapshot, refreshed if user_data changed.
+    With sample set to a fraction, an approximate average is printed with
+    its 95% confidence interval.
+    """
+    if sample:
+        estimate = approximate_average_age(sample)
+        average = estimate["average"]
+        if average["estimate"] is None:
+            print("Average age of users: 0")
+        else:
+            margin = average["high"] - average["estimate"]
+            print(f"Average age of users: {average['estimate']:.2f} "
+                  f"± {margin:.2f} (95% CI, {average['sample_size']} sampled)")
+            print(f"Total number of users: ~{estimate['count']['estimate']:.0f}")
+        return
+    if snapshot_path:
+        with open_snapshot(snapshot_path) as snapshot:
+            total_age = sum(snapshot.ages())
+            count = len(snapshot)
+    elif state_path:
+        stats = incremental_age_stats(state_path)
+        total_age = stats.mean * stats.count
+        count = stats.count
+    elif workers:
+        stats = parallel_reduce(partition_stats, merge_stats, workers=workers,
+                                query=UserQuery().select("age"))
+        total_age = stats.mean * stats.count
+        count = stats.count
+    elif pushdown:
+        aggregates = sql_aggregates()
+        total_age = aggregates["sum"] or 0
+        count = aggregates["count"]
+    else:
+        total_age = 0
+        count = 0
 
-    for age in stream_user_ages():
-        total_age += age
-        count += 1
+        for age in stream_user_ages():
+            total_age += age
+            count += 1
 
     if count == 0:
         print("Average age of users: 0")
@@ -40,5 +68,10 @@ def compute_average_age():
         print(f"Total number of users: {count}")
 
 
+def compute_age_stats():
+    """Compute count, mean, variance, min/max and quantiles in one pass."""
+    return StreamingStats().update(stream_user_ages()).summary()
+
+
 if __name__ == "__main__":
     compute_average_age()
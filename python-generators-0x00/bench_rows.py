@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+"""Compare per-row memory and decode throughput of the row formats.
+
+Runs on synthetic rows shaped like the ones the cursor returns, so no
+database is needed. bytes/row is what each decoded row adds on top of the
+field values themselves:
+
+    python3 bench_rows.py [rows]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+from rows import decode_namedtuple, decode_slots
+from query import USER_COLUMNS
+
+
+def decode_dict(row):
+    return dict(zip(USER_COLUMNS, row))
+
+
+def decode_tuple(row):
+    user_id, name, email, age = row
+    return (user_id, name, email, age)
+
+
+FORMATS = {
+    "dict": decode_dict,
+    "tuple": decode_tuple,
+    "namedtuple": decode_namedtuple,
+    "slots": decode_slots,
+}
+
+
+def make_rows(count):
+    """Build tuple rows like the ones an unbuffered cursor yields."""
+    return [
+        (f"{index:08x}-0000-4000-8000-000000000000", f"User {index}",
+         f"user{index}@example.com", Decimal(index % 100))
+        for index in range(count)
+    ]
+
+
+def measure(decode, rows):
+    """Return (bytes per row, rows per second) for one decoder."""
+    gc.collect()
+    tracemalloc.start()
+    decoded = [decode(row) for row in rows]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_row = (size - sys.getsizeof(decoded)) / len(rows)
+    del decoded
+
+    start = time.perf_counter()
+    for row in rows:
+        decode(row)
+    elapsed = time.perf_counter() - start
+    return per_row, len(rows) / elapsed
+
+
+def main(count=200_000):
+    rows = make_rows(count)
+    print(f"{'format':<12}{'bytes/row':>12}{'rows/sec':>14}")
+    for name, decode in FORMATS.items():
+        per_row, rate = measure(decode, rows)
+        print(f"{name:<12}{per_row:>12.1f}{rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
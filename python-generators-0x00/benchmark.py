@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+"""Benchmark the ways of reading user_data.
+
+Loads synthetic tables of several sizes into a scratch database, runs each
+access strategy at several batch/page sizes in a fresh process, and
+appends one JSON line per run to the output file:
+
+    python3 benchmark.py --sizes 10000 100000 --params 100 1000
+"""
+import json
+import time
+import argparse
+import resource
+import datetime
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+STRATEGIES = (
+    "stream_users",
+    "stream_users_in_batches",
+    "lazy_paginate",
+    "lazy_paginate_keyset",
+    "stream_user_ages",
+)
+# Strategies without a batch/page size run once per table size.
+UNSIZED = ("stream_user_ages",)
+
+
+def _rows(strategy, param):
+    """Return an iterator of the number of rows delivered by each step.
+
+    Modules are imported here, before timing starts; no query runs until
+    the iterator is first advanced.
+    """
+    if strategy == "stream_users":
+        stream_users = __import__('0-stream_users').stream_users
+        return (1 for _ in stream_users(fetch_size=param))
+    if strategy == "stream_users_in_batches":
+        batches = __import__('1-batch_processing').stream_users_in_batches
+        return (len(batch) for batch in batches(param))
+    if strategy == "lazy_paginate":
+        lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+        return (len(page) for page in lazy_paginate(param))
+    if strategy == "lazy_paginate_keyset":
+        lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+        return (len(page) for page in lazy_paginate(param, keyset=True))
+    if strategy == "stream_user_ages":
+        stream_user_ages = __import__('4-stream_ages').stream_user_ages
+        return (1 for _ in stream_user_ages())
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def run_strategy(strategy, param, database):
+    """Time one full read in the current process and return its metrics."""
+    import pool
+
+    pool.configure(database=database)
+    steps = _rows(strategy, param)
+    start = time.perf_counter()
+    first_row = None
+    rows = 0
+    for count in steps:
+        if first_row is None:
+            first_row = time.perf_counter() - start
+        rows += count
+    seconds = time.perf_counter() - start
+    stats = pool.get_pool().stats()
+    return {
+        "strategy": strategy,
+        "param": param,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds else 0.0,
+        "time_to_first_row": first_row,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "connections_created": stats["created"],
+        "connections_reused": stats["reused"],
+    }
+
+
+def prepare_table(database, size, seed=0):
+    """(Re)create user_data in the scratch database with size synthetic rows."""
+    import seed as seeder
+    import pool
+    from synthetic_data import insert_users
+
+    connection = seeder.connect_db()
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+    cursor.close()
+    connection.close()
+
+    with pool.configure(database=database).connection() as connection:
+        seeder.create_table(connection)
+        cursor = connection.cursor()
+        cursor.execute("TRUNCATE TABLE user_data")
+        cursor.close()
+        insert_users(connection, size, seed)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--params", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES)
+    parser.add_argument("--database", default="ALX_prodev_bench",
+                        help="scratch database; its user_data table is replaced")
+    parser.add_argument("--output", default="bench_results.jsonl")
+    args = parser.parse_args()
+
+    run = {
+        "started": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": git_revision(),
+    }
+    context = get_context("spawn")
+    with open(args.output, "a") as output:
+        for size in args.sizes:
+            prepare_table(args.database, size)
+            for strategy in args.strategies:
+                params = [None] if strategy in UNSIZED else args.params
+                for param in params:
+                    # A fresh process per run keeps peak RSS and pool counters separate.
+                    with ProcessPoolExecutor(1, mp_context=context) as executor:
+                        result = executor.submit(run_strategy, strategy, param,
+                                                 args.database).result()
+                    result.update(run, table_size=size)
+                    output.write(json.dumps(result) + "\n")
+                    output.flush()
+                    print(f"{size:>10} {strategy:<24} {str(param):>6} "
+                          f"{result['rows_per_sec']:>12,.0f} rows/s "
+                          f"ttfr {result['time_to_first_row'] or 0:.4f}s "
+                          f"rss {result['peak_rss_kb']} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import csv
+import queue
+import threading
+from abc import ABC, abstractmethod
+from stats import StreamingStats
+
+_DONE = object()
+
+
+class Consumer(ABC):
+    """Base for fan-out consumers: consume() each batch, then finish()."""
+
+    @abstractmethod
+    def consume(self, batch):
+        """Handle one batch of rows."""
+
+    def finish(self):
+        """Called once after the last batch; its return value is the result."""
+        return None
+
+    def get_state(self):
+        """Return JSON-serialisable state for checkpointing, if any."""
+        return None
+
+    def set_state(self, state):
+        """Restore state returned by get_state() when a job resumes."""
+
+
+class AgeFilterPrinter(Consumer):
+    """Prints users over a given age, like batch_processing."""
+
+    def __init__(self, min_age=25):
+        self.min_age = min_age
+
+    def consume(self, batch):
+        for user in batch:
+            if user['age'] > self.min_age:
+                print(user)
+
+
+class AverageAge(Consumer):
+    """Collects age statistics, like compute_average_age."""
+
+    def __init__(self):
+        self.stats = StreamingStats()
+
+    def consume(self, batch):
+        self.stats.update(user['age'] for user in batch)
+
+    def finish(self):
+        return self.stats
+
+    def get_state(self):
+        return self.stats.to_dict()
+
+    def set_state(self, state):
+        self.stats = StreamingStats.from_dict(state)
+
+
+class CsvExport(Consumer):
+    """Writes every row to a CSV file."""
+
+    def __init__(self, path, columns=("user_id", "name", "email", "age")):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=columns, extrasaction="ignore")
+        self.writer.writeheader()
+        self.rows = 0
+
+    def consume(self, batch):
+        self.writer.writerows(batch)
+        self.rows += len(batch)
+
+    def finish(self):
+        self.file.close()
+        return self.rows
+
+
+class _ThreadedConsumer:
+    """Runs a consumer on its own thread, fed through a bounded queue."""
+
+    def __init__(self, consumer, depth):
+        self.consumer = consumer
+        self.batches = queue.Queue(maxsize=depth)
+        self.result = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name=type(consumer).__name__,
+                                       daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        done = False
+        try:
+            while True:
+                batch = self.batches.get()
+                if batch is _DONE:
+                    done = True
+                    break
+                self.consumer.consume(batch)
+            self.result = self.consumer.finish()
+        except BaseException as error:
+            self.error = error
+            # Keep draining so the producer never blocks on a dead consumer.
+            while not done and self.batches.get() is not _DONE:
+                pass
+
+    def consume(self, batch):
+        self.batches.put(batch)
+
+    def finish(self):
+        self.batches.put(_DONE)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class Broadcast:
+    """Drives one scan and feeds every batch to all registered consumers.
+
+    N analyses over user_data then cost a single table scan. Consumers
+    registered with threaded=True run on their own thread behind a queue of
+    `depth` batches, so a slow consumer does not stall the others until its
+    queue is full. Batches are shared, so consumers must not modify them.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.consumers = {}
+
+    def register(self, name, consumer, threaded=False, depth=4):
+        """Add a consumer whose result will be reported under name."""
+        if name in self.consumers:
+            raise ValueError(f"Consumer already registered: {name}")
+        self.consumers[name] = (consumer, threaded, depth)
+        return self
+
+    def run(self):
+        """Scan the source once and return {name: consumer result}."""
+        running = {
+            name: _ThreadedConsumer(consumer, depth) if threaded else consumer
+            for name, (consumer, threaded, depth) in self.consumers.items()
+        }
+        try:
+            for batch in self.source:
+                for consumer in running.values():
+                    consumer.consume(batch)
+        finally:
+            results = {}
+            errors = []
+            for name, consumer in running.items():
+                try:
+                    results[name] = consumer.finish()
+                except Exception as error:
+                    errors.append(error)
+        if errors:
+            raise errors[0]
+        return results
+
+
+def shared_scan(batch_size, export_path=None, threaded=False):
+    """Run batch_processing, compute_average_age and an optional CSV export
+    over a single scan of user_data and return their results.
+    """
+    stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+    broadcast = Broadcast(stream_users_in_batches(batch_size))
+    broadcast.register("over_25", AgeFilterPrinter(25), threaded)
+    broadcast.register("age_stats", AverageAge(), threaded)
+    if export_path:
+        broadcast.register("export", CsvExport(export_path), threaded)
+    return broadcast.run()
@@ -0,0 +1,304 @@
+import os
+import math
+import pickle
+import shutil
+import hashlib
+import tempfile
+from abc import ABC, abstractmethod
+from fanout import Consumer
+from stats import StreamingStats
+
+
+class HyperLogLog:
+    """Approximate distinct counter using 2**precision one-byte registers.
+
+    The standard error is about 1.04 / sqrt(2**precision), e.g. 0.8% at the
+    default precision of 14 (16 KB). Counters with equal precision merge.
+    """
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        """Count one value; equal str() forms count once."""
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """Fold another counter with the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge counters with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """Estimate the number of distinct values added."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting is more accurate here.
+            return round(m * math.log(m / zeros))
+        return round(estimate)
+
+
+class Aggregate(ABC):
+    """Per-group aggregation: create() a state, add() rows, merge() partials.
+
+    States must be picklable so groups can be spilled to disk.
+    """
+
+    @abstractmethod
+    def create(self):
+        """Return the state of an empty group."""
+
+    @abstractmethod
+    def add(self, state, row):
+        """Return the state with row folded in."""
+
+    @abstractmethod
+    def merge(self, state, other):
+        """Return the combination of two partial states."""
+
+    def result(self, state):
+        return state
+
+
+class Count(Aggregate):
+    """Number of rows in the group."""
+
+    def create(self):
+        return 0
+
+    def add(self, state, row):
+        return state + 1
+
+    def merge(self, state, other):
+        return state + other
+
+
+class Histogram(Aggregate):
+    """Counts of a numeric column in buckets of the given width."""
+
+    def __init__(self, column, width=10):
+        if width <= 0:
+            raise ValueError("width must be positive")
+        self.column = column
+        self.width = width
+
+    def create(self):
+        return {}
+
+    def add(self, state, row):
+        bucket = int(float(row[self.column]) // self.width * self.width)
+        state[bucket] = state.get(bucket, 0) + 1
+        return state
+
+    def merge(self, state, other):
+        for bucket, count in other.items():
+            state[bucket] = state.get(bucket, 0) + count
+        return state
+
+    def result(self, state):
+        return dict(sorted(state.items()))
+
+
+class Stats(Aggregate):
+    """StreamingStats of a numeric column."""
+
+    def __init__(self, column):
+        self.column = column
+
+    def create(self):
+        return StreamingStats()
+
+    def add(self, state, row):
+        state.add(row[self.column])
+        return state
+
+    def merge(self, state, other):
+        return state.merge(other)
+
+    def result(self, state):
+        return state.summary()
+
+
+class Distinct(Aggregate):
+    """Approximate number of distinct values of a column (HyperLogLog)."""
+
+    def __init__(self, column, precision=10):
+        self.column = column
+        self.precision = precision
+
+    def create(self):
+        return HyperLogLog(self.precision)
+
+    def add(self, state, row):
+        state.add(row[self.column])
+        return state
+
+    def merge(self, state, other):
+        return state.merge(other)
+
+    def result(self, state):
+        return state.count()
+
+
+class GroupBy(Consumer):
+    """Streaming hash aggregation over batches of dict rows.
+
+    key is a column name or a function of the row. At most max_groups
+    groups are kept in memory; past that, the partial states are spilled to
+    `partitions` files by key hash and merged one partition at a time when
+    results are read. A partition holding more than max_groups keys is split
+    again with a differently seeded hash, so memory stays bounded for
+    high-cardinality keys.
+    """
+
+    # Beyond this many splits keys are merged in memory; partitions ** 8
+    # files are enough for any realistic number of distinct keys.
+    MAX_DEPTH = 8
+
+    def __init__(self, key, aggregate, max_groups=100_000, partitions=16, spill_dir=None):
+        if max_groups < 1 or partitions < 1:
+            raise ValueError("max_groups and partitions must be at least 1")
+        self.key = key if callable(key) else (lambda row: row[key])
+        self.aggregate = aggregate
+        self.max_groups = max_groups
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.groups = {}
+        self.workdir = None
+        self.spills = 0
+        self.repartitions = 0
+
+    def consume(self, batch):
+        groups = self.groups
+        aggregate = self.aggregate
+        for row in batch:
+            key = self.key(row)
+            state = groups.get(key)
+            groups[key] = aggregate.add(aggregate.create() if state is None else state, row)
+            if len(groups) > self.max_groups:
+                self._spill()
+                groups = self.groups
+
+    def _spill(self):
+        if self.workdir is None:
+            self.workdir = tempfile.mkdtemp(prefix="groupby-", dir=self.spill_dir)
+        self._partition(self.groups.items(), "", 0)
+        self.groups = {}
+        self.spills += 1
+
+    def _partition(self, items, prefix, depth):
+        """Append items to the partition files under prefix, by key hash."""
+        parts = [[] for _ in range(self.partitions)]
+        for item in items:
+            # Seeding the hash with depth splits a partition differently each time.
+            parts[hash((depth, item[0])) % self.partitions].append(item)
+        for number, part in enumerate(parts):
+            if part:
+                with open(self._part_path(f"{prefix}{number}"), "ab") as f:
+                    pickle.dump(part, f, pickle.HIGHEST_PROTOCOL)
+
+    def _part_path(self, name):
+        return f"{self.workdir}/{name}.pickle"
+
+    def _merge_part(self, name, depth):
+        """Yield (key, result) for a partition, splitting it if it is too large."""
+        aggregate = self.aggregate
+        path = self._part_path(name)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        merged = {}
+        split = False
+        with f:
+            while True:
+                try:
+                    items = pickle.load(f)
+                except EOFError:
+                    break
+                for key, state in items:
+                    mine = merged.get(key)
+                    merged[key] = state if mine is None else aggregate.merge(mine, state)
+                    if len(merged) > self.max_groups and depth < self.MAX_DEPTH:
+                        self._partition(merged.items(), f"{name}-", depth + 1)
+                        merged = {}
+                        split = True
+        os.remove(path)
+        if not split:
+            for key, state in merged.items():
+                yield key, aggregate.result(state)
+            return
+        self._partition(merged.items(), f"{name}-", depth + 1)
+        del merged
+        self.repartitions += 1
+        for number in range(self.partitions):
+            yield from self._merge_part(f"{name}-{number}", depth + 1)
+
+    def results(self):
+        """Generator yielding (key, result) for every group.
+
+        Groups come out in no particular order. Spill files are removed once
+        the generator is exhausted or closed.
+        """
+        aggregate = self.aggregate
+        if self.workdir is None:
+            for key, state in self.groups.items():
+                yield key, aggregate.result(state)
+            return
+        try:
+            if self.groups:
+                self._spill()
+            for number in range(self.partitions):
+                yield from self._merge_part(str(number), 0)
+        finally:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self.workdir = None
+
+    def finish(self):
+        return self.results()
+
+
+def group_by(batches, key, aggregate, max_groups=100_000, partitions=16):
+    """Generator yielding (key, result) per group of an iterable of batches."""
+    grouping = GroupBy(key, aggregate, max_groups, partitions)
+    for batch in batches:
+        grouping.consume(batch)
+    yield from grouping.results()
+
+
+def email_domain(row):
+    """Lower-cased domain part of a row's email."""
+    return row['email'].rpartition('@')[2].lower()
+
+
+def age_histogram_by_domain(batch_size=1000, width=10):
+    """Return {email domain: {age bucket: count}} over all of user_data."""
+    stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+    return dict(group_by(stream_users_in_batches(batch_size), email_domain, Histogram("age", width)))
+
+
+def distinct_count(column, batch_size=1000, precision=14):
+    """Estimate the number of distinct values of a user_data column."""
+    stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+    counter = HyperLogLog(precision)
+    for batch in stream_users_in_batches(batch_size):
+        counter.update(row[column] for row in batch)
+    return counter.count()
@@ -0,0 +1,159 @@
+import os
+import json
+import warnings
+from datetime import datetime, timedelta
+from pool import get_pool
+from query import UserQuery
+from stats import StreamingStats
+
+# Rows changed more recently than this many seconds are left for the next
+# run, so inserts whose seq was allocated earlier but that commit later are
+# not skipped. Transactions are assumed to commit within this window.
+DEFAULT_LAG = 5
+
+
+class WatermarkInvalidated(RuntimeError):
+    """Rows the watermark has already passed were changed, deleted or added."""
+
+
+class Watermark:
+    """High-water mark on user_data.seq plus state carried between runs.
+
+    as_of is the updated_at time every row up to seq was read as of. Saved
+    as JSON next to the job; writes go through a temporary file and
+    os.replace, so the mark and its state are always updated together.
+    """
+
+    def __init__(self, path, seq=0, state=None, as_of=None):
+        self.path = path
+        self.seq = seq
+        self.state = state
+        self.as_of = as_of
+
+    @classmethod
+    def load(cls, path):
+        """Load the mark from path, or start from zero if there is none."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(path)
+        return cls(path, data["seq"], data.get("state"), data.get("as_of"))
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"seq": self.seq, "state": self.state, "as_of": self.as_of}, f)
+        os.replace(tmp, self.path)
+
+
+def database_time(lag=0):
+    """Return the server's current time minus lag seconds, as a string."""
+    with get_pool().connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT NOW(6)")
+        (now,) = cursor.fetchone()
+        cursor.close()
+    if isinstance(now, str):
+        now = datetime.fromisoformat(now)
+    return (now - timedelta(seconds=lag)).isoformat(sep=" ")
+
+
+def changed_since(watermark):
+    """Count rows up to watermark.seq that changed after it read them."""
+    if watermark.as_of is None or watermark.seq == 0:
+        return 0
+    query = (UserQuery().aggregate("seq", "COUNT")
+             .where("seq", "<=", watermark.seq).where("updated_at", ">", watermark.as_of))
+    return query.fetch_all(dictionary=False)[0][0]
+
+
+def rows_up_to(watermark):
+    """Count the rows the watermark has passed."""
+    query = UserQuery().aggregate("seq", "COUNT").where("seq", "<=", watermark.seq)
+    return query.fetch_all(dictionary=False)[0][0]
+
+
+def new_rows(watermark, batch_size=1000, query=None, dictionary=True,
+             lag=DEFAULT_LAG, check_updates=True, expected_rows=None):
+    """Generator yielding batches of rows inserted after the watermark.
+
+    Rows are read in seq order with the seq column appended, and
+    watermark.seq advances past each batch as it is yielded; saving the
+    mark is left to the caller, once the batch has been handled. Reading
+    stops before the first row changed within the last lag seconds.
+
+    With check_updates, raises WatermarkInvalidated if rows the mark has
+    already passed were updated since, as results built from them are stale.
+    With expected_rows, the number of rows already read, it also raises if
+    the rows up to the mark no longer number that many: rows were deleted,
+    or committed below the mark later than lag allowed for.
+    """
+    if check_updates:
+        changed = changed_since(watermark)
+        if changed:
+            raise WatermarkInvalidated(
+                f"{changed} row(s) up to seq {watermark.seq} changed after {watermark.as_of}")
+    if expected_rows is not None and watermark.seq:
+        found = rows_up_to(watermark)
+        if found != expected_rows:
+            raise WatermarkInvalidated(
+                f"{found} row(s) up to seq {watermark.seq}, {expected_rows} were read")
+    cutoff = database_time(lag)
+    # Everything from the first recently changed row onwards waits a run.
+    (bound,) = (UserQuery().aggregate("seq", "MIN").where("seq", ">", watermark.seq)
+                .where("updated_at", ">", cutoff).fetch_all(dictionary=False)[0])
+
+    query = query or UserQuery()
+    if "seq" not in query.columns:
+        query = query.select(*query.columns, "seq")
+    query = query.where("seq", ">", watermark.seq).order_by("seq")
+    if bound is not None:
+        query = query.where("seq", "<", bound)
+    watermark.as_of = cutoff
+    for batch in query.batches(batch_size, dictionary):
+        last = batch[-1]
+        watermark.seq = last["seq"] if dictionary else last[-1]
+        yield batch
+
+
+def incremental_age_stats(path, batch_size=1000, lag=DEFAULT_LAG):
+    """Fold only rows added since the last run into the saved age statistics.
+
+    If rows already folded in were updated or deleted since, or rows below
+    the mark committed late, the saved statistics are discarded with a
+    warning and rebuilt from every row.
+    """
+    watermark = Watermark.load(path)
+    try:
+        stats = _fold_new_ages(watermark, batch_size, lag)
+    except WatermarkInvalidated as error:
+        warnings.warn(f"Rebuilding age statistics: {error}", RuntimeWarning)
+        # Without a lag, or the rebuild would stop at the row just updated.
+        watermark = Watermark(path)
+        stats = _fold_new_ages(watermark, batch_size, 0)
+    watermark.state = stats.to_dict()
+    watermark.save()
+    return stats
+
+
+def _fold_new_ages(watermark, batch_size, lag):
+    stats = StreamingStats.from_dict(watermark.state) if watermark.state else StreamingStats()
+    for batch in new_rows(watermark, batch_size, UserQuery().select("age"),
+                          dictionary=False, lag=lag, expected_rows=stats.count):
+        stats.update(age for age, _ in batch)
+    return stats
+
+
+def process_new_users(batch_size, path):
+    """Print users over age 25 that were added since the last run.
+
+    Updates to users printed before do not make them new, so they are not
+    checked for.
+    """
+    watermark = Watermark.load(path)
+    query = UserQuery().where("age", ">", 25)
+    for batch in new_rows(watermark, batch_size, query, check_updates=False):
+        for user in batch:
+            print(user)
+        watermark.save()
@@ -0,0 +1,161 @@
+import json
+import time
+import sqlite3
+from query import UserQuery
+
+
+class CheckpointStore:
+    """Local SQLite store of job checkpoints (last key plus consumer state)."""
+
+    def __init__(self, path="checkpoints.db"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                job TEXT PRIMARY KEY,
+                last_key TEXT,
+                state TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def load(self, job):
+        """Return (last_key, state) for job, or (None, None) if none saved."""
+        row = self.conn.execute(
+            "SELECT last_key, state FROM checkpoints WHERE job = ?", (job,)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], json.loads(row[1])
+
+    def save(self, job, last_key, state):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (job, last_key, state, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (job, last_key, json.dumps(state), time.time()))
+
+    def clear(self, job):
+        with self.conn:
+            self.conn.execute("DELETE FROM checkpoints WHERE job = ?", (job,))
+
+    def close(self):
+        self.conn.close()
+
+
+class SqliteSink:
+    """Exactly-once sink writing rows to a local SQLite table.
+
+    Rows and the checkpoint are committed in the same transaction, so after
+    a crash the sink's own checkpoint says exactly which rows it holds.
+    """
+
+    def __init__(self, path, table="users"):
+        self.table = table
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                user_id TEXT PRIMARY KEY, name TEXT, email TEXT, age REAL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sink_checkpoint (
+                sink TEXT PRIMARY KEY, last_key TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def consume(self, batch):
+        self.conn.executemany(
+            f"INSERT INTO {self.table} (user_id, name, email, age) VALUES (?, ?, ?, ?)",
+            [(u['user_id'], u['name'], u['email'], float(u['age'])) for u in batch])
+
+    def commit(self, last_key):
+        """Commit pending rows together with the key they reach up to."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sink_checkpoint (sink, last_key) VALUES (?, ?)",
+            (self.table, last_key))
+        self.conn.commit()
+
+    def checkpoint(self):
+        """Return the last key committed with the sink's rows, or None."""
+        row = self.conn.execute(
+            "SELECT last_key FROM sink_checkpoint WHERE sink = ?", (self.table,)).fetchone()
+        return row[0] if row else None
+
+    def abort(self):
+        """Drop rows written since the last commit."""
+        self.conn.rollback()
+        self.conn.close()
+
+    def finish(self):
+        self.conn.close()
+
+
+class BatchJob:
+    """Resumable job feeding user_data batches, in user_id order, to a consumer.
+
+    Every checkpoint_every batches the last processed user_id and the
+    consumer's state (see fanout.Consumer.get_state) go to the store; a
+    restarted job resumes right after that key. Batches handled after the
+    last checkpoint are replayed, so delivery is at-least-once. With
+    exactly_once=True the consumer must be a sink with commit(last_key) and
+    checkpoint(), like SqliteSink, which keeps the checkpoint with its own
+    output instead.
+    """
+
+    def __init__(self, name, consumer, batch_size=1000, checkpoint_every=10,
+                 store=None, query=None, exactly_once=False):
+        if exactly_once and not hasattr(consumer, "commit"):
+            raise ValueError("exactly_once needs a consumer with commit() and checkpoint()")
+        self.name = name
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.store = store if store is not None else CheckpointStore()
+        self.query = query or UserQuery()
+        self.exactly_once = exactly_once
+
+    def _resume(self):
+        if self.exactly_once:
+            return self.consumer.checkpoint()
+        last_key, state = self.store.load(self.name)
+        if state is not None:
+            self.consumer.set_state(state)
+        return last_key
+
+    def _checkpoint(self, last_key):
+        if self.exactly_once:
+            self.consumer.commit(last_key)
+        else:
+            self.store.save(self.name, last_key, self.consumer.get_state())
+
+    def run(self):
+        """Process every remaining batch and return the consumer's result."""
+        last_key = self._resume()
+        query = self.query
+        if "user_id" not in query.columns:
+            query = query.select(*query.columns, "user_id")
+        query = query.order_by("user_id")
+        if last_key is not None:
+            query = query.after(("user_id",), (last_key,))
+
+        pending = 0
+        try:
+            for batch in query.batches(self.batch_size):
+                self.consumer.consume(batch)
+                last_key = batch[-1]["user_id"]
+                pending += 1
+                if pending >= self.checkpoint_every:
+                    self._checkpoint(last_key)
+                    pending = 0
+            if pending:
+                self._checkpoint(last_key)
+        except BaseException:
+            if self.exactly_once and hasattr(self.consumer, "abort"):
+                self.consumer.abort()
+            raise
+
+        result = self.consumer.finish()
+        if not self.exactly_once:
+            self.store.clear(self.name)
+        return result
@@ -0,0 +1,107 @@
+import queue
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from query import UserQuery
+
+KEY_SPACE = 16 ** 4
+
+
+def partition_bounds(partitions):
+    """Split the user_id key space into contiguous (low, high) ranges.
+
+    user_id holds UUIDs, whose leading hex digits are uniformly spread, so
+    equal slices of the first four digits give evenly sized partitions.
+    The first low and the last high are None (unbounded).
+    """
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    cuts = [format(i * KEY_SPACE // partitions, "04x") for i in range(1, partitions)]
+    return list(zip([None] + cuts, cuts + [None]))
+
+
+def partition_query(bounds, query=None):
+    """Restrict a query to the user_id range given by bounds."""
+    low, high = bounds
+    query = query or UserQuery()
+    if low is not None:
+        query = query.where("user_id", ">=", low)
+    if high is not None:
+        query = query.where("user_id", "<", high)
+    return query
+
+
+def _scan_partition(bounds, query, batch_size, dictionary, batches, stop):
+    try:
+        for batch in partition_query(bounds, query).batches(batch_size, dictionary):
+            if stop.is_set():
+                return
+            batches.put(batch)
+    finally:
+        batches.put(None)
+
+
+def _reduce_partition(mapper, bounds, query, batch_size, dictionary):
+    return mapper(partition_query(bounds, query).batches(batch_size, dictionary))
+
+
+def parallel_scan(workers=4, batch_size=1000, partitions=None, query=None,
+                  dictionary=True):
+    """Generator yielding batches from all partitions, scanned concurrently.
+
+    Each partition is read by a worker process over its own connection and
+    batches are yielded in arrival order. Breaking out early stops the
+    workers.
+    """
+    bounds = partition_bounds(partitions or workers)
+    with multiprocessing.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        batches = manager.Queue(maxsize=workers * 2)
+        stop = manager.Event()
+        futures = [
+            executor.submit(_scan_partition, b, query, batch_size, dictionary,
+                            batches, stop)
+            for b in bounds
+        ]
+        remaining = len(futures)
+        try:
+            while remaining:
+                try:
+                    batch = batches.get(timeout=1)
+                except queue.Empty:
+                    for future in futures:
+                        if future.done() and future.exception():
+                            raise future.exception()
+                    continue
+                if batch is None:
+                    remaining -= 1
+                else:
+                    yield batch
+            for future in futures:
+                future.result()
+        finally:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            while not all(future.done() for future in futures):
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+
+def parallel_reduce(mapper, merge, workers=4, batch_size=1000, partitions=None,
+                    query=None, dictionary=False):
+    """Map every partition in a worker process and merge the results.
+
+    mapper receives a generator of batches for one partition and must be a
+    picklable, module-level function; merge folds two partial results.
+    """
+    bounds = partition_bounds(partitions or workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_reduce_partition, mapper, b, query, batch_size,
+                            dictionary)
+            for b in bounds
+        ]
+        return functools.reduce(merge, (future.result() for future in futures))
@@ -0,0 +1,198 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+import mysql.connector
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections shared by the generators.
+
+    Connections are handed out with acquire()/release() (or the connection()
+    context manager) and reused between calls, so walking many pages costs a
+    single handshake. Idle connections older than max_idle seconds are
+    recycled, and connections idle longer than ping_after seconds are pinged
+    before being handed out again.
+    """
+
+    def __init__(self, max_size=5, max_idle=300, ping_after=30, **connect_args):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        self.connect_args = {
+            "host": os.getenv("MYSQL_HOST"),
+            "user": os.getenv("MYSQL_USER"),
+            "password": os.getenv("MYSQL_PASSWORD"),
+            "database": "ALX_prodev",
+        }
+        self.connect_args.update(connect_args)
+        self.created = 0
+        self.reused = 0
+        self.recycled = 0
+        self._idle = []
+        self._in_use = 0
+        self._closed = False
+        self._lock = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Borrow a connection, creating one if the pool is not yet full."""
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                while not self._idle and self._in_use >= self.max_size:
+                    if not self._lock.wait(timeout):
+                        raise TimeoutError("Timed out waiting for a free connection")
+                self._in_use += 1
+                idle = self._idle.pop() if self._idle else None
+
+            if idle is None:
+                return self._create()
+
+            connection, released_at = idle
+            if self._healthy(connection, time.monotonic() - released_at):
+                with self._lock:
+                    self.reused += 1
+                return connection
+            self._discard(connection)
+            with self._lock:
+                self.recycled += 1
+                self._in_use -= 1
+                self._lock.notify()
+
+    def release(self, connection):
+        """Return a borrowed connection to the pool.
+
+        A connection with unread rows (a stream closed early) is discarded,
+        since draining it would read the rest of the result over the wire.
+        """
+        reusable = False
+        try:
+            if not connection.unread_result:
+                connection.rollback()
+                reusable = True
+        except mysql.connector.Error:
+            pass
+
+        with self._lock:
+            self._in_use -= 1
+            if not reusable:
+                self.recycled += 1
+            if reusable and not self._closed:
+                self._idle.append((connection, time.monotonic()))
+                connection = None
+            self._lock.notify()
+        if connection is not None:
+            self._discard(connection)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that borrows a connection and always returns it."""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def stats(self):
+        """Return counters for connections created, reused and recycled."""
+        with self._lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "recycled": self.recycled,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+            }
+
+    def close(self):
+        """Close every idle connection and refuse further borrowing."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._lock.notify_all()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def _create(self):
+        try:
+            connection = mysql.connector.connect(**self.connect_args)
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self.created += 1
+        return connection
+
+    def _healthy(self, connection, idle_for):
+        if idle_for > self.max_idle:
+            return False
+        if idle_for <= self.ping_after:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except mysql.connector.Error:
+            pass
+
+
+_pool = None
+_pool_settings = None
+_pool_lock = threading.Lock()
+# Pools inherited across fork(). They are kept alive but never used: if the
+# child let them be collected, closing their connections would shut down
+# sockets the parent is still using.
+_inherited = []
+
+
+def get_pool():
+    """Return the pool shared by all generators, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if _pool_settings is not None:
+                _pool = ConnectionPool(**_pool_settings)
+            else:
+                _pool = ConnectionPool(
+                    max_size=int(os.getenv("MYSQL_POOL_SIZE", "5")),
+                    max_idle=float(os.getenv("MYSQL_POOL_MAX_IDLE", "300")),
+                )
+        return _pool
+
+
+def configure(**kwargs):
+    """Replace the shared pool with one built from the given settings."""
+    global _pool, _pool_settings
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool_settings = kwargs
+        _pool = ConnectionPool(**kwargs)
+        return _pool
+
+
+def _reset_after_fork():
+    # A forked child must not share the parent's sockets, so it starts a
+    # fresh pool with the same settings on first use.
+    global _pool, _pool_lock
+    if _pool is not None:
+        _inherited.append(_pool)
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
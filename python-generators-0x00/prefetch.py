@@ -0,0 +1,63 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries an exception from the producer thread to the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, depth=2):
+    """Generator that reads ahead up to depth items on a background thread.
+
+    Wrap stream_users_in_batches, lazy_paginate or stream_users with it so
+    the next batches are fetched while the current one is processed. The
+    bounded queue applies backpressure; closing the generator (a break or
+    an exhausted islice) stops the thread and closes the wrapped iterator.
+    """
+    if depth < 1:
+        raise ValueError("depth must be at least 1")
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        source = iter(iterable)
+        try:
+            for item in source:
+                if not put(item):
+                    return
+        except BaseException as error:
+            put(_Failure(error))
+            return
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,165 @@
+from pool import get_pool
+
+USER_COLUMNS = ("user_id", "name", "email", "age")
+# Columns that can be selected, filtered and sorted on but are not part of
+# the default row: seq is the insertion-order key used as a watermark and
+# updated_at the time a row was last inserted or changed.
+COLUMNS = USER_COLUMNS + ("seq", "updated_at")
+UNIQUE_KEYS = ("user_id", "seq")
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "LIKE", "IN")
+AGGREGATES = ("COUNT", "SUM", "AVG", "MIN", "MAX")
+
+
+def check_column(column):
+    """Raise ValueError unless column is a user_data column."""
+    if column not in COLUMNS:
+        raise ValueError(f"Unknown column: {column}")
+    return column
+
+
+class UserQuery:
+    """Composable SELECT over user_data.
+
+    Column projection, filters, ordering and limits are rendered into SQL so
+    only the rows and columns that are needed leave the database. Every
+    method returns a new query, so partial queries can be shared safely.
+    """
+
+    def __init__(self):
+        self.columns = USER_COLUMNS
+        self.conditions = ()
+        self.params = ()
+        self.order = ()
+        self.descending = False
+        self.row_limit = None
+        self.row_offset = 0
+
+    def _copy(self, **changes):
+        query = UserQuery.__new__(UserQuery)
+        query.__dict__.update(self.__dict__, **changes)
+        return query
+
+    def select(self, *columns):
+        """Project the query onto the given columns."""
+        return self._copy(columns=tuple(check_column(c) for c in columns))
+
+    def aggregate(self, column, *functions):
+        """Select aggregate functions of a column instead of raw rows."""
+        check_column(column)
+        for function in functions:
+            if function not in AGGREGATES:
+                raise ValueError(f"Unsupported aggregate: {function}")
+        return self._copy(columns=tuple(f"{f}({column})" for f in functions))
+
+    def where(self, column, op, value):
+        """Add a `column op value` filter; filters are ANDed together."""
+        check_column(column)
+        op = op.upper()
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        if op == "IN":
+            values = tuple(value)
+            if not values:
+                raise ValueError("IN needs at least one value")
+            condition = f"{column} IN ({', '.join(['%s'] * len(values))})"
+        else:
+            values = (value,)
+            condition = f"{column} {op} %s"
+        return self._copy(conditions=self.conditions + (condition,),
+                          params=self.params + values)
+
+    def after(self, columns, values):
+        """Seek past the row whose ordering columns equal values.
+
+        For composite keys the row comparison is preceded by a bound on the
+        leading column, which MySQL can always turn into an index range.
+        """
+        columns = tuple(check_column(c) for c in columns)
+        values = tuple(values)
+        if len(columns) != len(values):
+            raise ValueError("after() needs one value per column")
+        if len(columns) == 1:
+            condition = f"{columns[0]} > %s"
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            condition = (f"{columns[0]} >= %s AND "
+                         f"({', '.join(columns)}) > ({placeholders})")
+            values = values[:1] + values
+        return self._copy(conditions=self.conditions + (condition,),
+                          params=self.params + values)
+
+    def sample(self, fraction, seed=None):
+        """Keep each row independently with probability fraction (RAND() < p).
+
+        Every row is still read on the server, but only the sample is sent.
+        With a seed, MySQL repeats the same sample while the table is unchanged.
+        """
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction must be in (0, 1]")
+        if seed is None:
+            condition, values = "RAND() < %s", (fraction,)
+        else:
+            condition, values = "RAND(%s) < %s", (seed, fraction)
+        return self._copy(conditions=self.conditions + (condition,),
+                          params=self.params + values)
+
+    def order_by(self, *columns, descending=False):
+        """Order the results by the given columns."""
+        return self._copy(order=tuple(check_column(c) for c in columns),
+                          descending=descending)
+
+    def limit(self, count, offset=0):
+        """Return at most count rows, skipping the first offset rows."""
+        return self._copy(row_limit=count, row_offset=offset)
+
+    def build(self):
+        """Render the query into an SQL string and its parameters."""
+        sql = f"SELECT {', '.join(self.columns)} FROM user_data"
+        params = self.params
+        if self.conditions:
+            sql += " WHERE " + " AND ".join(self.conditions)
+        if self.order:
+            direction = " DESC" if self.descending else ""
+            sql += " ORDER BY " + ", ".join(c + direction for c in self.order)
+        if self.row_limit is not None:
+            sql += " LIMIT %s"
+            params += (self.row_limit,)
+            if self.row_offset:
+                sql += " OFFSET %s"
+                params += (self.row_offset,)
+        return sql, params
+
+    def batches(self, batch_size, dictionary=True):
+        """Generator yielding lists of up to batch_size rows.
+
+        Uses an unbuffered cursor so rows stay on the server until fetched.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        sql, params = self.build()
+        with get_pool().connection() as connection:
+            cursor = connection.cursor(buffered=False, dictionary=dictionary)
+            cursor.execute(sql, params)
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+            cursor.close()
+
+    def stream(self, fetch_size=1000, dictionary=True):
+        """Generator yielding rows one by one, fetch_size at a time."""
+        for rows in self.batches(fetch_size, dictionary):
+            yield from rows
+
+    def fetch_all(self, dictionary=True):
+        """Run the query and return every row."""
+        sql, params = self.build()
+        with get_pool().connection() as connection:
+            cursor = connection.cursor(dictionary=dictionary)
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            cursor.close()
+        return rows
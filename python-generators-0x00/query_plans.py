@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+"""Check the EXPLAIN plans of the queries the generators issue.
+
+Each query is labelled with the access it is expected to get:
+
+    scan      reads the whole table by design (stream_users, offset pages)
+    seek      must use an index and must not sort (keyset pages, ranges)
+    covering  must be answered from an index alone (stream_user_ages)
+
+Run it against a seeded database to list the plans and any regressions:
+
+    python3 query_plans.py
+"""
+from pool import get_pool
+from query import UserQuery
+from parallel_scan import partition_bounds, partition_query
+
+EXPECTATIONS = ("scan", "seek", "covering")
+
+
+def generator_queries():
+    """Return (name, UserQuery, expectation) for each query the generators run.
+
+    Seek values are placeholders; the plan does not depend on them.
+    """
+    lazy_paginate = __import__('2-lazy_paginate')
+    low, high = partition_bounds(4)[1]
+    return [
+        ("stream_users", UserQuery(), "scan"),
+        ("batch_processing", UserQuery().where("age", ">", 25), "scan"),
+        ("paginate_users", UserQuery().limit(100, 1000), "scan"),
+        ("stream_user_ages", UserQuery().select("age"), "covering"),
+        ("keyset_first_page", lazy_paginate.keyset_query(100), "seek"),
+        ("keyset_user_id", lazy_paginate.keyset_query(100, ["8"]), "seek"),
+        ("keyset_seq", lazy_paginate.keyset_query(100, [1000], "seq"), "seek"),
+        ("keyset_age", lazy_paginate.keyset_query(100, [40, "8"], "age"), "seek"),
+        ("keyset_email", lazy_paginate.keyset_query(100, ["m", "8"], "email"), "seek"),
+        ("new_rows", UserQuery().select(*UserQuery().columns, "seq")
+            .where("seq", ">", 1000).order_by("seq").where("seq", "<", 2000), "seek"),
+        ("changed_since", UserQuery().aggregate("seq", "COUNT").where("seq", "<=", 1000)
+            .where("updated_at", ">", "2024-01-01"), "seek"),
+        ("rows_up_to", UserQuery().aggregate("seq", "COUNT").where("seq", "<=", 1000), "seek"),
+        ("batch_job_resume", UserQuery().order_by("user_id")
+            .after(("user_id",), ("8",)), "seek"),
+        ("parallel_scan_partition", partition_query((low, high)), "seek"),
+    ]
+
+
+def explain(query):
+    """Return the EXPLAIN rows of a UserQuery as dicts."""
+    sql, params = query.build()
+    with get_pool().connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("EXPLAIN " + sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def problems_in(plan, expectation):
+    """Return what is wrong with a plan, or an empty list if it meets expectation."""
+    if expectation not in EXPECTATIONS:
+        raise ValueError(f"Unknown expectation: {expectation}")
+    found = []
+    for row in plan:
+        access = row.get("type")
+        extra = row.get("Extra") or ""
+        if expectation == "seek":
+            if access == "ALL" or row.get("key") is None:
+                found.append(f"full table scan (type={access})")
+            if "filesort" in extra:
+                found.append("sorts instead of reading in index order")
+        elif expectation == "covering" and "Using index" not in extra:
+            found.append(f"not covered by an index (type={access}, key={row.get('key')})")
+    return found
+
+
+def check_plans(queries=None):
+    """EXPLAIN every generator query and return one report dict per query."""
+    reports = []
+    for name, query, expectation in queries or generator_queries():
+        plan = explain(query)
+        reports.append({
+            "name": name,
+            "expectation": expectation,
+            "type": ", ".join(str(row.get("type")) for row in plan),
+            "key": ", ".join(str(row.get("key")) for row in plan),
+            "problems": problems_in(plan, expectation),
+        })
+    return reports
+
+
+def main():
+    reports = check_plans()
+    for report in reports:
+        status = "ok" if not report["problems"] else "; ".join(report["problems"])
+        print(f"{report['name']:<26} {report['expectation']:<9} "
+              f"type={report['type']:<7} key={report['key']:<10} {status}")
+    return 1 if any(report["problems"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+from collections import namedtuple
+from query import USER_COLUMNS
+
+ROW_FORMATS = ("dict", "tuple", "namedtuple", "slots")
+
+UserRow = namedtuple("UserRow", USER_COLUMNS)
+
+
+class UserRecord:
+    """Compact user_data row stored in __slots__ instead of a dict."""
+
+    __slots__ = USER_COLUMNS
+
+    def __init__(self, user_id, name, email, age):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __repr__(self):
+        return (f"UserRecord(user_id={self.user_id!r}, name={self.name!r}, "
+                f"email={self.email!r}, age={self.age!r})")
+
+    def __eq__(self, other):
+        if not isinstance(other, UserRecord):
+            return NotImplemented
+        return all(getattr(self, c) == getattr(other, c) for c in USER_COLUMNS)
+
+
+def native_age(age):
+    """Convert a DECIMAL age to an int, or a float if it has a fraction."""
+    whole = int(age)
+    return whole if whole == age else float(age)
+
+
+def decode_namedtuple(row):
+    user_id, name, email, age = row
+    return UserRow(user_id, name, email, native_age(age))
+
+
+def decode_slots(row):
+    user_id, name, email, age = row
+    return UserRecord(user_id, name, email, native_age(age))
+
+
+DECODERS = {
+    "namedtuple": decode_namedtuple,
+    "slots": decode_slots,
+}
+
+
+def get_decoder(row_format, columns=USER_COLUMNS):
+    """Return the function turning a tuple row into row_format, or None.
+
+    None means the cursor's own dict or tuple rows are used unchanged.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"Unknown row format: {row_format}")
+    decoder = DECODERS.get(row_format)
+    if decoder is not None and tuple(columns) != USER_COLUMNS:
+        raise ValueError(f"{row_format} rows need every user_data column")
+    return decoder
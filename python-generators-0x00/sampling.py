@@ -0,0 +1,121 @@
+import math
+import random
+from itertools import islice
+from statistics import NormalDist
+from query import UserQuery
+from stats import StreamingStats
+
+_END = object()
+
+
+def bernoulli_sample(fraction, query=None, seed=None, batch_size=1000, dictionary=True):
+    """Generator yielding a Bernoulli sample of the query's rows.
+
+    The sampling is done in MySQL, so only about fraction of the rows
+    cross the network.
+    """
+    query = (query or UserQuery()).sample(fraction, seed)
+    yield from query.stream(batch_size, dictionary)
+
+
+def _uniform(rng):
+    """Random float in the open interval (0, 1)."""
+    value = rng.random()
+    while value == 0.0:
+        value = rng.random()
+    return value
+
+
+def reservoir_sample(iterable, k, seed=None):
+    """Return k items chosen uniformly from an iterable of unknown length.
+
+    Uses Li's Algorithm L, which jumps over the items it will not keep, so
+    random numbers are drawn O(k log(n/k)) times instead of once per item.
+    Returns every item if there are fewer than k.
+    """
+    if k < 0:
+        raise ValueError("k must not be negative")
+    rng = random.Random(seed)
+    items = iter(iterable)
+    reservoir = list(islice(items, k))
+    if len(reservoir) < k or k == 0:
+        return reservoir
+    weight = math.exp(math.log(_uniform(rng)) / k)
+    while True:
+        skip = math.floor(math.log(_uniform(rng)) / math.log1p(-weight))
+        item = next(islice(items, skip, None), _END)
+        if item is _END:
+            return reservoir
+        reservoir[rng.randrange(k)] = item
+        weight *= math.exp(math.log(_uniform(rng)) / k)
+
+
+def _z(confidence):
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def estimate_mean(stats, fraction=None, confidence=0.95):
+    """Mean of a sample with a normal-approximation confidence interval.
+
+    stats is the StreamingStats of the sample. When the sample is a known
+    fraction of the population, the finite population correction is applied.
+    """
+    z = _z(confidence)
+    if stats.count == 0:
+        return {"estimate": None, "low": None, "high": None, "stderr": None,
+                "sample_size": 0, "confidence": confidence}
+    stderr = math.sqrt(stats.variance / stats.count)
+    if fraction is not None:
+        stderr *= math.sqrt(1 - fraction)
+    return {
+        "estimate": stats.mean,
+        "low": stats.mean - z * stderr,
+        "high": stats.mean + z * stderr,
+        "stderr": stderr,
+        "sample_size": stats.count,
+        "confidence": confidence,
+    }
+
+
+def estimate_count(sample_size, fraction, confidence=0.95):
+    """Population size implied by a Bernoulli sample, with its interval."""
+    z = _z(confidence)
+    estimate = sample_size / fraction
+    stderr = math.sqrt(sample_size * (1 - fraction)) / fraction
+    return {
+        "estimate": estimate,
+        "low": max(sample_size, estimate - z * stderr),
+        "high": estimate + z * stderr,
+        "stderr": stderr,
+        "confidence": confidence,
+    }
+
+
+def approximate_average_age(fraction=0.01, confidence=0.95, seed=None):
+    """Estimate the average age and user count from a Bernoulli sample.
+
+    Returns {"average": ..., "count": ...}, each an estimate with the bounds
+    of its confidence interval.
+    """
+    query = UserQuery().select("age")
+    stats = StreamingStats().update(
+        age for (age,) in bernoulli_sample(fraction, query, seed, dictionary=False))
+    return {
+        "average": estimate_mean(stats, fraction, confidence),
+        "count": estimate_count(stats.count, fraction, confidence),
+    }
+
+
+def sample_users(k, fraction=None, seed=None):
+    """Return k users chosen uniformly at random.
+
+    With fraction set, rows are first thinned in SQL, so fewer rows are
+    streamed; fraction should leave comfortably more than k rows.
+    """
+    if fraction is None:
+        rows = UserQuery().stream()
+    else:
+        rows = bernoulli_sample(fraction, seed=seed)
+    return reservoir_sample(rows, k, seed)
@@ -3,8 +3,17 @@ import mysql.connector
 from dotenv import load_dotenv
 import uuid
 import csv
+import time
+import hashlib
+import io
+import queue
+import threading
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 load_dotenv()
 
+USER_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "user_data.ALX_prodev")
+
 url = os.getenv("DATABASE_URL")
 if url is None:
     raise ValueError("DATABASE_URL environment variable not set")
@@ -25,18 +34,23 @@ def create_database(connection):
     connection.commit()
     cursor.close()
 
-def connect_to_prodev():
+def connect_to_prodev(allow_local_infile=False):
     """Connect to the database and create the database if it doesn't exist."""
     return mysql.connector.connect(
         host=os.getenv("MYSQL_HOST"),
         user=os.getenv("MYSQL_USER"),
         password=os.getenv("MYSQL_PASSWORD"),
-        database="ALX_prodev"
+        database="ALX_prodev",
+        allow_local_infile=allow_local_infile
     )
     
 
-def create_table(connection):
-    """Create the table in the database."""
+def create_table(connection, dedupe=False):
+    """Create the table in the database.
+
+    See ensure_indexes for dedupe, which an older table with repeated
+    emails needs before its unique email index can be built.
+    """
     cursor = connection.cursor()
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS user_data (
@@ -44,31 +58,511 @@ def create_table(connection):
             name VARCHAR(255) NOT NULL,
             email VARCHAR(255) NOT NULL,
             age DECIMAL NOT NULL,
-            INDEX (user_id)
+            content_hash CHAR(32) NULL,
+            seq BIGINT UNSIGNED NOT NULL AUTO_INCREMENT UNIQUE,
+            updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+                ON UPDATE CURRENT_TIMESTAMP(6)
         )
     """)
     connection.commit()
     cursor.close()
+    ensure_column(connection, "content_hash", "CHAR(32) NULL")
+    # seq numbers rows in insertion order; incremental jobs use it as a watermark.
+    ensure_column(connection, "seq", "BIGINT UNSIGNED NOT NULL AUTO_INCREMENT UNIQUE")
+    # updated_at lets them notice rows changed after the watermark passed them.
+    ensure_column(connection, "updated_at", "TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) "
+                                            "ON UPDATE CURRENT_TIMESTAMP(6)")
+    ensure_indexes(connection, dedupe)
+
+
+def ensure_column(connection, column, definition, table="user_data"):
+    """Add a column to a table if an older schema lacks it."""
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        AND COLUMN_NAME = %s
+    """, (table, column))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        connection.commit()
+    cursor.close()
+
+
+# Secondary indexes on user_data. InnoDB appends the primary key to each,
+# so (age) serves ORDER BY age, user_id seeks and covers SELECT age scans.
+INDEXES = {
+    "idx_age": ("age",),
+    "idx_updated_at": ("updated_at",),
+}
+# email identifies a user across reseeds (see reseed_data).
+UNIQUE_INDEXES = {
+    "uniq_email": ("email",),
+}
+# Older schemas declared INDEX (user_id), which duplicates the primary key,
+# and a plain idx_email that uniq_email replaces.
+REDUNDANT_INDEXES = ("user_id", "idx_email")
 
-def insert_data(connection, data):
-    """Insert data into the table."""
+
+def existing_indexes(connection):
+    """Return the names of the indexes currently on user_data."""
     cursor = connection.cursor()
-    insert_query = ("""
-        INSERT INTO user_data (user_id, name, email, age)
-        VALUES (%s, %s, %s, %s)
+    cursor.execute("""
+        SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data'
     """)
-    records = []
+    names = {name for (name,) in cursor.fetchall()}
+    cursor.close()
+    return names
+
+
+def ensure_indexes(connection, dedupe=False):
+    """Create the INDEXES that are missing and drop redundant ones.
+
+    If rows repeat a UNIQUE_INDEXES key, raises ValueError listing them
+    unless dedupe is set, in which case all but the first-inserted row of
+    each are deleted first (see remove_duplicates). Safe to run repeatedly;
+    returns the names of the indexes it changed.
+    """
+    present = existing_indexes(connection)
+    missing_unique = {name: columns for name, columns in UNIQUE_INDEXES.items()
+                      if name not in present}
+    # Check before changing anything, so a refusal leaves the schema as it was.
+    for name, columns in missing_unique.items():
+        if dedupe:
+            continue
+        duplicates = find_duplicates(connection, columns)
+        if duplicates:
+            shown = ", ".join(str(value) for value in duplicates[:20])
+            more = f" and {len(duplicates) - 20} more" if len(duplicates) > 20 else ""
+            raise ValueError(
+                f"Cannot create {name}: repeated {', '.join(columns)}: {shown}{more}. "
+                "Remove them, or pass dedupe=True to keep the first-inserted row "
+                "of each.")
+    changed = []
+    cursor = connection.cursor()
+    for name in REDUNDANT_INDEXES:
+        if name in present:
+            cursor.execute(f"DROP INDEX {name} ON user_data")
+            changed.append(name)
+    for name, columns in INDEXES.items():
+        if name not in present:
+            cursor.execute(f"CREATE INDEX {name} ON user_data ({', '.join(columns)})")
+            changed.append(name)
+    for name, columns in missing_unique.items():
+        if dedupe:
+            remove_duplicates(connection, columns)
+        cursor.execute(f"CREATE UNIQUE INDEX {name} ON user_data ({', '.join(columns)})")
+        changed.append(name)
+    connection.commit()
+    cursor.close()
+    return changed
+
+
+def find_duplicates(connection, columns):
+    """Return the values of columns shared by more than one row."""
+    cursor = connection.cursor()
+    cursor.execute(f"""
+        SELECT {', '.join(columns)} FROM user_data
+        GROUP BY {', '.join(columns)} HAVING COUNT(*) > 1
+    """)
+    duplicates = [row[0] if len(row) == 1 else row for row in cursor.fetchall()]
+    cursor.close()
+    return duplicates
+
+
+def remove_duplicates(connection, columns):
+    """Delete all but the first-inserted row of each group of equal columns.
+
+    Undoes tables doubled by loading the same CSV twice, so a unique index
+    can be built. Returns the number of rows deleted.
+    """
+    cursor = connection.cursor()
+    # The extra derived table lets MySQL delete from the table it reads.
+    cursor.execute(f"""
+        DELETE FROM user_data WHERE seq NOT IN (
+            SELECT keep FROM (
+                SELECT MIN(seq) AS keep FROM user_data GROUP BY {', '.join(columns)}
+            ) AS keepers
+        )
+    """)
+    deleted = cursor.rowcount
+    connection.commit()
+    cursor.close()
+    return deleted
+
+
+INSERT_QUERY = """
+    INSERT INTO user_data (user_id, name, email, age)
+    VALUES (%s, %s, %s, %s)
+"""
+
+
+def user_id_for(email):
+    """Derive a stable user_id from an email address."""
+    return str(uuid.uuid5(USER_NAMESPACE, email.strip().lower()))
+
+
+def content_hash(name, email, age):
+    """Hash the content of a row so unchanged rows can be skipped."""
+    return hashlib.md5(f"{name}\x1f{email}\x1f{age!r}".encode()).hexdigest()
+
+
+def read_records(data, deterministic_ids=False):
+    """Generator parsing the CSV one row at a time into insert tuples."""
     with open(data, newline='') as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
-            user_id = str(uuid.uuid4())
+            if deterministic_ids:
+                user_id = user_id_for(row['email'])
+            else:
+                user_id = str(uuid.uuid4())
             name = row['name']
             email = row['email']
             age = float(row['age'])  # convert age to float
-            records.append((user_id, name, email, age))
+            yield (user_id, name, email, age)
+
 
-    cursor.executemany(insert_query, records)
+def chunked(records, chunk_size):
+    """Generator grouping an iterable into lists of up to chunk_size items."""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def create_progress_table(connection):
+    """Create the table that records how far each CSV load has committed."""
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS seed_progress (
+            source VARCHAR(255) PRIMARY KEY,
+            rows_done BIGINT NOT NULL,
+            fingerprint CHAR(64) NULL
+        )
+    """)
     connection.commit()
     cursor.close()
+    ensure_column(connection, "fingerprint", "CHAR(64) NULL", table="seed_progress")
+
+
+def file_fingerprint(data):
+    """Hash of a file's size, modification time and first 64 KiB.
+
+    Changes when the file is edited or replaced, so a load is never
+    resumed against different contents.
+    """
+    info = os.stat(data)
+    digest = hashlib.sha256(f"{info.st_size}:{info.st_mtime_ns}:".encode())
+    with open(data, "rb") as f:
+        digest.update(f.read(64 * 1024))
+    return digest.hexdigest()
+
+
+def stream_insert_data(connection, data, chunk_size=1000, resume=True, progress=None):
+    """Insert the CSV in chunks without ever holding the whole file.
+
+    Each chunk is committed in the same transaction as the number of rows
+    loaded so far, so a failed load resumes after the last committed chunk.
+    The file's fingerprint is saved alongside, and resuming raises
+    ValueError if the file has changed since; pass resume=False to load it
+    from the start instead. progress, if given, is called with the running stats after each chunk.
+    Returns the rows inserted, elapsed seconds and rows per second.
+    """
+    create_progress_table(connection)
+    source = os.path.abspath(data)
+    fingerprint = file_fingerprint(data)
+    cursor = connection.cursor()
+    done = 0
+    if resume:
+        cursor.execute("SELECT rows_done, fingerprint FROM seed_progress WHERE source = %s",
+                       (source,))
+        row = cursor.fetchone()
+        if row and row[1] != fingerprint:
+            cursor.close()
+            raise ValueError(f"{data} changed since a load of it stopped after {row[0]} rows; "
+                             "pass resume=False to load it from the start")
+        done = row[0] if row else 0
+
+    stats = {"rows": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+    start = time.monotonic()
+    try:
+        for chunk in chunked(islice(read_records(data), done, None), chunk_size):
+            cursor.executemany(INSERT_QUERY, chunk)
+            done += len(chunk)
+            cursor.execute("""
+                INSERT INTO seed_progress (source, rows_done, fingerprint) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE rows_done = VALUES(rows_done),
+                    fingerprint = VALUES(fingerprint)
+            """, (source, done, fingerprint))
+            connection.commit()
+            stats["rows"] += len(chunk)
+            stats["seconds"] = time.monotonic() - start
+            stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+            if progress:
+                progress(stats)
+    except Exception:
+        connection.rollback()
+        cursor.close()
+        raise
+
+    cursor.execute("DELETE FROM seed_progress WHERE source = %s", (source,))
     connection.commit()
-    cursor.close()
\ No newline at end of file
+    cursor.close()
+    return stats
+
+
+def load_data_infile(connection, data):
+    """Bulk load the CSV with LOAD DATA LOCAL INFILE.
+
+    This is the fastest path but needs local_infile enabled on the server
+    and a connection from connect_to_prodev(allow_local_infile=True).
+    """
+    start = time.monotonic()
+    cursor = connection.cursor()
+    cursor.execute("""
+        LOAD DATA LOCAL INFILE %s INTO TABLE user_data
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+        LINES TERMINATED BY '\\n'
+        IGNORE 1 LINES
+        (name, email, age)
+        SET user_id = UUID()
+    """, (os.path.abspath(data),))
+    rows = cursor.rowcount
+    connection.commit()
+    cursor.close()
+    seconds = time.monotonic() - start
+    return {"rows": rows, "seconds": seconds, "rows_per_sec": rows / seconds if seconds else 0.0}
+
+
+UPSERT_QUERY = """
+    INSERT INTO user_data (user_id, name, email, age, content_hash)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE name = VALUES(name), age = VALUES(age),
+        content_hash = VALUES(content_hash)
+"""
+
+
+def reseed_data(connection, data, chunk_size=1000, delete_missing=True):
+    """Idempotently sync user_data with the CSV.
+
+    Rows are matched on their (unique) email and upserted, but only when
+    their content hash differs from the stored one, so a refresh writes just
+    the rows that changed. New rows get ids derived from their email;
+    existing rows keep theirs. With delete_missing, rows whose email is not
+    in the CSV are deleted once it has been read in full (never for an
+    empty CSV). A table with repeated emails, left by loading the CSV twice
+    before emails were unique, is deduplicated first. Returns how many rows
+    were read, written and deleted.
+    """
+    ensure_indexes(connection, dedupe=True)
+    stats = {"rows": 0, "written": 0, "deleted": 0}
+    cursor = connection.cursor()
+    if delete_missing:
+        # Emails seen in the CSV, kept server-side so any file size works.
+        cursor.execute("CREATE TEMPORARY TABLE IF NOT EXISTS seed_seen "
+                       "(email VARCHAR(255) PRIMARY KEY)")
+        cursor.execute("DELETE FROM seed_seen")
+    for chunk in chunked(read_records(data, deterministic_ids=True), chunk_size):
+        hashed = [record + (content_hash(*record[1:]),) for record in chunk]
+        placeholders = ", ".join(["%s"] * len(hashed))
+        cursor.execute(
+            f"SELECT email, content_hash FROM user_data WHERE email IN ({placeholders})",
+            [record[2] for record in hashed])
+        # MySQL compares emails case-insensitively, so match them that way.
+        stored = {email.lower(): digest for email, digest in cursor.fetchall()}
+        changed = [record for record in hashed if stored.get(record[2].lower()) != record[4]]
+        if changed:
+            cursor.executemany(UPSERT_QUERY, changed)
+        if delete_missing:
+            cursor.executemany("""
+                INSERT INTO seed_seen (email) VALUES (%s)
+                ON DUPLICATE KEY UPDATE email = email
+            """, [(record[2],) for record in chunk])
+        connection.commit()
+        stats["rows"] += len(chunk)
+        stats["written"] += len(changed)
+
+    if delete_missing:
+        if stats["rows"]:
+            cursor.execute("""
+                DELETE FROM user_data
+                WHERE NOT EXISTS (SELECT 1 FROM seed_seen WHERE seed_seen.email = user_data.email)
+            """)
+            stats["deleted"] = cursor.rowcount
+        cursor.execute("DROP TABLE seed_seen")
+        connection.commit()
+    cursor.close()
+    return stats
+
+
+def split_csv(data, chunk_bytes=64 * 1024 * 1024):
+    """Return the header fields and (start, end) byte ranges of whole records.
+
+    Each range ends just after a newline that lies outside any quoted field,
+    so quoted values containing newlines are never cut in two. Quote parity
+    is tracked with bytes.count, so the pass runs at close to disk speed.
+    """
+    with open(data, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        start = position = f.tell()
+        boundaries = [start]
+        target = start + chunk_bytes
+        quoted = 0
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+            i = 0
+            while i < len(block):
+                if position + i < target:
+                    skip = min(len(block), target - position)
+                    quoted ^= block.count(b'"', i, skip) & 1
+                    i = skip
+                    continue
+                newline = block.find(b"\n", i)
+                if newline == -1:
+                    quoted ^= block.count(b'"', i) & 1
+                    break
+                quoted ^= block.count(b'"', i, newline) & 1
+                i = newline + 1
+                if not quoted:
+                    boundaries.append(position + i)
+                    target = position + i + chunk_bytes
+            position += len(block)
+    if boundaries[-1] != position:
+        boundaries.append(position)
+    return header, list(zip(boundaries, boundaries[1:]))
+
+
+def parse_chunk(data, start, end, header, deterministic_ids=False):
+    """Parse and validate the records in data[start:end].
+
+    Runs in a worker process. Returns the insert tuples and the number of
+    rows rejected for a missing name or email or a non-numeric age.
+    """
+    with open(data, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    records = []
+    rejected = 0
+    for row in csv.DictReader(io.StringIO(text, newline=''), fieldnames=header):
+        name = (row.get('name') or '').strip()
+        email = (row.get('email') or '').strip()
+        try:
+            age = float(row['age'])
+        except (KeyError, TypeError, ValueError):
+            age = None
+        if not name or not email or age is None or age < 0:
+            rejected += 1
+            continue
+        user_id = user_id_for(email) if deterministic_ids else str(uuid.uuid4())
+        records.append((user_id, name, email, age))
+    return records, rejected
+
+
+def parallel_insert_data(connection, data, workers=None, chunk_bytes=4 * 1024 * 1024,
+                         batch_size=1000, depth=4, deterministic_ids=False):
+    """Insert a large CSV using a process pool to parse it.
+
+    The file is split with split_csv and the chunks are parsed in parallel,
+    then handed in file order to a writer thread. A chunk is only submitted
+    for parsing once the writer has finished with an earlier one, so at most
+    workers + depth parsed chunks of about chunk_bytes each are alive at a
+    time, however large the file and however slow the database. Only the
+    writer thread uses connection. Returns the rows inserted, rows rejected,
+    elapsed seconds and rows per second.
+
+    Each chunk is committed on its own. If the load fails, the chunks
+    already committed stay in the table and there is no way to resume; load
+    the file again with insert_data(reseed=True) to complete it.
+    """
+    if depth < 1:
+        raise ValueError("depth must be at least 1")
+    header, ranges = split_csv(data, chunk_bytes)
+    missing = {'name', 'email', 'age'} - set(header)
+    if missing:
+        raise ValueError(f"{data} has no column(s): {', '.join(sorted(missing))}")
+
+    workers = workers or os.cpu_count() or 1
+    stats = {"rows": 0, "rejected": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+    chunks = queue.Queue()
+    # One slot per parsed chunk that may be alive: parsing, queued or being written.
+    slots = threading.Semaphore(workers + depth)
+    failure = []
+    start = time.monotonic()
+
+    def write():
+        cursor = connection.cursor()
+        try:
+            while True:
+                records = chunks.get()
+                if records is None:
+                    break
+                for batch in chunked(records, batch_size):
+                    cursor.executemany(INSERT_QUERY, batch)
+                connection.commit()
+                stats["rows"] += len(records)
+                records = None
+                slots.release()
+        except Exception as error:
+            failure.append(error)
+            connection.rollback()
+            slots.release()
+            # Keep draining so the producer never blocks on a dead writer.
+            while chunks.get() is not None:
+                slots.release()
+        finally:
+            cursor.close()
+
+    def submit(executor, chunk_start, chunk_end):
+        slots.acquire()
+        return executor.submit(parse_chunk, data, chunk_start, chunk_end,
+                               header, deterministic_ids)
+
+    writer = threading.Thread(target=write, name="csv-writer", daemon=True)
+    writer.start()
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            pending = iter(ranges)
+            in_flight = [submit(executor, *bounds) for bounds in islice(pending, workers)]
+            while in_flight and not failure:
+                records, rejected = in_flight.pop(0).result()
+                stats["rejected"] += rejected
+                chunks.put(records)
+                del records
+                # Blocks until the writer frees a slot once workers + depth are alive.
+                for bounds in islice(pending, 1):
+                    in_flight.append(submit(executor, *bounds))
+            for future in in_flight:
+                future.cancel()
+    finally:
+        chunks.put(None)
+        writer.join()
+    if failure:
+        raise failure[0]
+
+    stats["seconds"] = time.monotonic() - start
+    stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def insert_data(connection, data, reseed=False, workers=None, infile=False):
+    """Insert data into the table.
+
+    With reseed=True the load is idempotent: it only writes changed rows
+    and deletes rows missing from the CSV. Otherwise rows are appended, and
+    an email already in the table is an error. With workers set, large files
+    are parsed in parallel processes (see parallel_insert_data). With
+    infile=True the file is bulk loaded by the server (see load_data_infile).
+    """
+    if reseed:
+        reseed_data(connection, data)
+    elif infile:
+        load_data_infile(connection, data)
+    elif workers:
+        parallel_insert_data(connection, data, workers=workers)
+    else:
+        stream_insert_data(connection, data)
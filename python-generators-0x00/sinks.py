@@ -0,0 +1,216 @@
+import io
+import os
+import sys
+import csv
+import json
+import struct
+from abc import abstractmethod
+from array import array
+from decimal import Decimal
+from fanout import Consumer
+
+COLUMNAR_MAGIC = b"UDC1"
+FLOAT_COLUMN = 0
+STRING_COLUMN = 1
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == int(value) else float(value)
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class BufferedSink(Consumer):
+    """Base for output sinks that encode whole batches and write in bulk.
+
+    Encoded batches are buffered until flush_rows rows are pending and then
+    written with a single write() call. If the reader of a pipe goes away,
+    the remaining output is discarded instead of raising BrokenPipeError and
+    broken_pipe is set, so producers can stop reading input for it.
+    Writes to path if given, otherwise to stdout.
+    """
+
+    binary = False
+
+    def __init__(self, path=None, flush_rows=10_000, stream=None):
+        self.flush_rows = flush_rows
+        self.owns_stream = stream is None and path is not None
+        if stream is not None:
+            self.stream = stream
+        elif path is not None:
+            self.stream = open(path, "wb" if self.binary else "w",
+                               **({} if self.binary else {"newline": ""}))
+        else:
+            self.stream = sys.stdout.buffer if self.binary else sys.stdout
+        self.chunks = []
+        self.pending = 0
+        self.rows = 0
+        self.broken_pipe = False
+        self.started = False
+
+    @abstractmethod
+    def encode(self, batch):
+        """Return the encoded form of a batch (str, or bytes if binary)."""
+
+    def header(self):
+        """Return anything written once before the first batch."""
+        return b"" if self.binary else ""
+
+    def write(self, batch):
+        """Buffer a batch of rows, flushing once enough rows are pending."""
+        count = len(next(iter(batch.values()))) if isinstance(batch, dict) else len(batch)
+        if self.broken_pipe or not count:
+            return
+        self._start()
+        self.chunks.append(self.encode(batch))
+        self.pending += count
+        self.rows += count
+        if self.pending >= self.flush_rows:
+            self.flush()
+
+    consume = write
+
+    def _start(self):
+        if not self.started:
+            self.chunks.append(self.header())
+            self.started = True
+
+    def flush(self):
+        if self.broken_pipe or not self.chunks:
+            return
+        data = (b"" if self.binary else "").join(self.chunks)
+        self.chunks = []
+        self.pending = 0
+        try:
+            self.stream.write(data)
+            self.stream.flush()
+        except BrokenPipeError:
+            self._pipe_closed()
+
+    def _pipe_closed(self):
+        # Point the descriptor at /dev/null so the interpreter's own flush at
+        # exit does not raise again (see the signal module's SIGPIPE notes).
+        self.broken_pipe = True
+        try:
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, self.stream.fileno())
+            os.close(devnull)
+        except (OSError, ValueError, io.UnsupportedOperation):
+            pass
+
+    def finish(self):
+        """Flush what is left, close files this sink opened, return the row count."""
+        self._start()
+        self.flush()
+        if self.owns_stream:
+            self.stream.close()
+        return self.rows
+
+
+class NdjsonSink(BufferedSink):
+    """Writes one JSON object per row."""
+
+    def encode(self, batch):
+        if isinstance(batch, dict):
+            batch = [dict(zip(batch, values)) for values in zip(*batch.values())]
+        dumps = json.JSONEncoder(default=_json_default).encode
+        return "".join(dumps(row) + "\n" for row in batch)
+
+
+class CsvSink(BufferedSink):
+    """Writes rows as CSV with a header line."""
+
+    def __init__(self, path=None, flush_rows=10_000, stream=None,
+                 columns=("user_id", "name", "email", "age")):
+        super().__init__(path, flush_rows, stream)
+        self.columns = columns
+
+    def header(self):
+        return ",".join(self.columns) + "\r\n"
+
+    def encode(self, batch):
+        out = io.StringIO()
+        writer = csv.writer(out)
+        if isinstance(batch, dict):
+            writer.writerows(zip(*(batch[c] for c in self.columns)))
+        else:
+            writer.writerows([row[c] for c in self.columns] for row in batch)
+        return out.getvalue()
+
+
+class ColumnarSink(BufferedSink):
+    """Writes batches as blocks of binary columns.
+
+    Each block holds the row count and, per column, either little-endian
+    float64 values or uint32 offsets followed by a UTF-8 blob. Read it back
+    with read_columnar().
+    """
+
+    binary = True
+
+    def header(self):
+        return COLUMNAR_MAGIC
+
+    def encode(self, batch):
+        if isinstance(batch, dict):
+            columns = {name: values.tolist() if hasattr(values, "tolist") else list(values)
+                       for name, values in batch.items()}
+        else:
+            columns = {name: [row[name] for row in batch] for name in batch[0]}
+        rows = len(next(iter(columns.values())))
+        parts = [struct.pack("<IH", rows, len(columns))]
+        for name, values in columns.items():
+            encoded = name.encode()
+            parts.append(struct.pack("<H", len(encoded)) + encoded)
+            if all(isinstance(v, (int, float, Decimal)) for v in values):
+                data = array("d", map(float, values))
+                if sys.byteorder == "big":
+                    data.byteswap()
+                parts.append(struct.pack("<B", FLOAT_COLUMN) + data.tobytes())
+            else:
+                blobs = [str(v).encode() for v in values]
+                offsets = array("I", [0])
+                for blob in blobs:
+                    offsets.append(offsets[-1] + len(blob))
+                if sys.byteorder == "big":
+                    offsets.byteswap()
+                parts.append(struct.pack("<B", STRING_COLUMN) + offsets.tobytes())
+                parts.append(b"".join(blobs))
+        return b"".join(parts)
+
+
+def read_columnar(path):
+    """Generator yielding each block of a ColumnarSink file as a dict of lists."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != COLUMNAR_MAGIC:
+        raise ValueError(f"{path} is not a columnar user_data file")
+    position = 4
+    while position < len(data):
+        rows, count = struct.unpack_from("<IH", data, position)
+        position += 6
+        block = {}
+        for _ in range(count):
+            (length,) = struct.unpack_from("<H", data, position)
+            position += 2
+            name = data[position:position + length].decode()
+            position += length
+            kind = data[position]
+            position += 1
+            if kind == FLOAT_COLUMN:
+                values = array("d", data[position:position + rows * 8])
+                position += rows * 8
+                if sys.byteorder == "big":
+                    values.byteswap()
+                block[name] = values.tolist()
+            else:
+                offsets = array("I", data[position:position + (rows + 1) * 4])
+                position += (rows + 1) * 4
+                if sys.byteorder == "big":
+                    offsets.byteswap()
+                blob = data[position:position + offsets[-1]]
+                position += offsets[-1]
+                block[name] = [blob[offsets[i]:offsets[i + 1]].decode() for i in range(rows)]
+        yield block
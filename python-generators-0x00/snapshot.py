@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import mmap
+import shutil
+import struct
+import tempfile
+from array import array
+from pool import get_pool
+from query import USER_COLUMNS, UserQuery
+
+MAGIC = b"UDS1"
+STRING_COLUMNS = ("user_id", "name", "email")
+
+
+def source_fingerprint():
+    """Return the row count and CHECKSUM TABLE value of user_data."""
+    with get_pool().connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM user_data")
+        (rows,) = cursor.fetchone()
+        cursor.execute("CHECKSUM TABLE user_data")
+        checksum = cursor.fetchone()[1]
+        cursor.close()
+    return {"rows": rows, "checksum": checksum}
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def export_snapshot(path, batch_size=10_000):
+    """Write user_data to a memory-mappable columnar snapshot file.
+
+    Ages are stored as a float64 array and each string column as uint64
+    offsets plus a UTF-8 blob. Columns are streamed into temporary files
+    first, so memory use does not depend on the table size, and the final
+    file replaces any old snapshot atomically.
+    """
+    fingerprint = source_fingerprint()
+    workdir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        parts = {"age": open(os.path.join(workdir, "age"), "wb")}
+        sizes = {}
+        for name in STRING_COLUMNS:
+            parts[name + ".offsets"] = open(os.path.join(workdir, name + ".offsets"), "wb")
+            parts[name + ".blob"] = open(os.path.join(workdir, name + ".blob"), "wb")
+            array("Q", [0]).tofile(parts[name + ".offsets"])
+            sizes[name] = 0
+
+        rows = 0
+        age_index = USER_COLUMNS.index("age")
+        for batch in UserQuery().batches(batch_size, dictionary=False):
+            array("d", (float(row[age_index]) for row in batch)).tofile(parts["age"])
+            for name in STRING_COLUMNS:
+                index = USER_COLUMNS.index(name)
+                blobs = [row[index].encode() for row in batch]
+                offsets = array("Q")
+                for blob in blobs:
+                    sizes[name] += len(blob)
+                    offsets.append(sizes[name])
+                offsets.tofile(parts[name + ".offsets"])
+                parts[name + ".blob"].write(b"".join(blobs))
+            rows += len(batch)
+        for part in parts.values():
+            part.close()
+
+        # Lay the sections out back to back, each aligned to 8 bytes.
+        order = ["age"] + [f"{n}.{kind}" for n in STRING_COLUMNS for kind in ("offsets", "blob")]
+        lengths = {name: os.path.getsize(os.path.join(workdir, name)) for name in order}
+        meta = {"rows": rows, "source": fingerprint, "byteorder": sys.byteorder}
+        header_size = 4096
+        while True:
+            sections = {}
+            offset = header_size
+            for name in order:
+                offset = _align(offset)
+                sections[name] = [offset, lengths[name]]
+                offset += lengths[name]
+            meta["sections"] = sections
+            encoded = json.dumps(meta).encode()
+            if len(MAGIC) + 4 + len(encoded) <= header_size:
+                break
+            header_size *= 2
+
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as out:
+            out.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+            for name in order:
+                out.write(b"\0" * (sections[name][0] - out.tell()))
+                with open(os.path.join(workdir, name), "rb") as part:
+                    shutil.copyfileobj(part, out)
+        os.replace(tmp, path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot written by export_snapshot.
+
+    Serves the same generator API as the database-backed modules. Column
+    access slices the mapping directly: ages(start, stop) is a zero-copy
+    float64 memoryview, and strings are decoded only when a row is read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:4] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a user_data snapshot")
+        (length,) = struct.unpack_from("<I", self.map, 4)
+        self.meta = json.loads(self.map[8:8 + length])
+        if self.meta["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError(f"{path} was written on a {self.meta['byteorder']}-endian host")
+        self.rows = self.meta["rows"]
+
+        self._views = []
+        self._ages = self._section("age", "d")
+        self._strings = {
+            name: (self._section(name + ".offsets", "Q"), self._section(name + ".blob"))
+            for name in STRING_COLUMNS
+        }
+
+    def _section(self, name, typecode=None):
+        offset, length = self.meta["sections"][name]
+        view = memoryview(self.map)[offset:offset + length]
+        self._views.append(view)
+        if typecode is not None:
+            view = view.cast(typecode)
+            self._views.append(view)
+        return view
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Unmap the file; slices handed out by ages() must be released first."""
+        try:
+            for view in reversed(getattr(self, "_views", [])):
+                view.release()
+            self._views = []
+            self.map.close()
+        finally:
+            self.file.close()
+
+    def __len__(self):
+        return self.rows
+
+    def is_fresh(self):
+        """True if user_data still has the row count and checksum it was taken from."""
+        return source_fingerprint() == self.meta["source"]
+
+    def ages(self, start=0, stop=None):
+        """Zero-copy float64 memoryview over the ages of rows start..stop."""
+        return self._ages[start:stop]
+
+    def strings(self, name, start=0, stop=None):
+        """Decode the values of a string column for rows start..stop."""
+        offsets, blob = self._strings[name]
+        stop = self.rows if stop is None else min(stop, self.rows)
+        return [bytes(blob[offsets[i]:offsets[i + 1]]).decode() for i in range(start, stop)]
+
+    def columns(self, start=0, stop=None):
+        """Return rows start..stop as a dict of columns.
+
+        Ages are copied into an array, so batches stay valid after close().
+        """
+        batch = {name: self.strings(name, start, stop) for name in STRING_COLUMNS}
+        with self.ages(start, stop) as ages:
+            batch["age"] = array("d", ages)
+        return {name: batch[name] for name in USER_COLUMNS}
+
+    def stream_users_in_batches(self, batch_size, columnar=False):
+        """Generator yielding batches of dict rows, or dicts of columns."""
+        for start in range(0, self.rows, batch_size):
+            batch = self.columns(start, start + batch_size)
+            if columnar:
+                yield batch
+            else:
+                yield [dict(zip(batch, values)) for values in zip(*batch.values())]
+
+    def stream_users(self):
+        """Generator yielding every row as a dict."""
+        for batch in self.stream_users_in_batches(10_000):
+            yield from batch
+
+    def stream_user_ages(self):
+        """Generator yielding every age."""
+        yield from self._ages
+
+
+def open_snapshot(path, check=True):
+    """Open the snapshot at path, re-exporting it first if it is missing or stale."""
+    if os.path.exists(path):
+        snapshot = Snapshot(path)
+        if not check or snapshot.is_fresh():
+            return snapshot
+        snapshot.close()
+    export_snapshot(path)
+    return Snapshot(path)
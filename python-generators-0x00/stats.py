@@ -0,0 +1,223 @@
+import math
+from query import UserQuery
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with bounded relative error (DDSketch).
+
+    Values are counted in logarithmic buckets, so any quantile estimate is
+    within relative_accuracy of a true value and memory depends only on the
+    range of values seen, not on how many there were.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value):
+        """Count one value."""
+        if value > 0:
+            index = self._index(value)
+            self.positive[index] = self.positive.get(index, 0) + 1
+        elif value < 0:
+            index = self._index(-value)
+            self.negative[index] = self.negative.get(index, 0) + 1
+        else:
+            self.zeros += 1
+        self.count += 1
+
+    def merge(self, other):
+        """Fold another sketch with the same accuracy into this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for mine, theirs in ((self.positive, other.positive),
+                             (self.negative, other.negative)):
+            for index, count in theirs.items():
+                mine[index] = mine.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def to_dict(self):
+        """Return the sketch state as JSON-serialisable data."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": self.positive,
+            "negative": self.negative,
+            "zeros": self.zeros,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a sketch saved with to_dict()."""
+        sketch = cls(data["relative_accuracy"])
+        sketch.positive = {int(k): v for k, v in data["positive"].items()}
+        sketch.negative = {int(k): v for k, v in data["negative"].items()}
+        sketch.zeros = data["zeros"]
+        sketch.count = sketch.zeros + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        return sketch
+
+    def quantile(self, q):
+        """Estimate the q-quantile (0 <= q <= 1), or None if empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive))
+
+
+class StreamingStats:
+    """Single-pass count, mean, variance, min/max and quantiles.
+
+    Uses Welford's update, so state stays constant-size, and partial states
+    from different partitions can be combined with merge().
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value):
+        """Fold one value into the statistics."""
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.sketch.add(value)
+
+    def update(self, values):
+        """Fold every value of an iterable into the statistics."""
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """Combine another partial state into this one."""
+        if other.count:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+            self.mean += delta * other.count / total
+            self.count = total
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def to_dict(self):
+        """Return the state as JSON-serialisable data, e.g. to carry it forward."""
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.min,
+            "max": self.max,
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild statistics saved with to_dict()."""
+        stats = cls()
+        stats.count = data["count"]
+        stats.mean = data["mean"]
+        stats.m2 = data["m2"]
+        stats.min = data["min"]
+        stats.max = data["max"]
+        stats.sketch = QuantileSketch.from_dict(data["sketch"])
+        return stats
+
+    @property
+    def variance(self):
+        """Sample variance, or 0.0 with fewer than two values."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def summary(self):
+        """Return the statistics as a dict, quantiles included."""
+        result = {
+            "count": self.count,
+            "mean": self.mean if self.count else None,
+            "variance": self.variance,
+            "min": self.min,
+            "max": self.max,
+        }
+        for q in QUANTILES:
+            result[f"p{round(q * 100)}"] = self.quantile(q)
+        return result
+
+
+def partition_stats(batches):
+    """Build StreamingStats from batches of single-column tuple rows.
+
+    Module-level so it can be used as a parallel_reduce mapper.
+    """
+    stats = StreamingStats()
+    for batch in batches:
+        stats.update(value for (value,) in batch)
+    return stats
+
+
+def merge_stats(first, second):
+    """Merge two partial StreamingStats (a parallel_reduce merge)."""
+    return first.merge(second)
+
+
+def sql_aggregates(query=None, column="age"):
+    """Compute exact COUNT/SUM/AVG/MIN/MAX of a column inside MySQL."""
+    query = (query or UserQuery()).aggregate(column, "COUNT", "SUM", "AVG", "MIN", "MAX")
+    count, total, mean, low, high = query.fetch_all(dictionary=False)[0]
+    return {
+        "count": count,
+        "sum": _to_float(total),
+        "mean": _to_float(mean),
+        "min": _to_float(low),
+        "max": _to_float(high),
+    }
+
+
+def _to_float(value):
+    return None if value is None else float(value)
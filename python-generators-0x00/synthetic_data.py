@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+"""Deterministic synthetic user_data for load testing.
+
+Streams any number of rows to a CSV in the same shape as user_data.csv,
+or straight into the database, in constant memory:
+
+    python3 synthetic_data.py big_user_data.csv 10000000 --seed 42
+    python3 synthetic_data.py --insert 1000000
+"""
+import csv
+import math
+import uuid
+import random
+import argparse
+
+FIRST_NAMES = (
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael",
+    "Linda", "William", "Elizabeth", "David", "Barbara", "Richard", "Susan",
+    "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Daniel",
+    "Nancy", "Matthew", "Lisa", "Anthony", "Betty", "Mark", "Margaret",
+    "Donald", "Sandra", "Steven", "Ashley", "Paul", "Kimberly", "Andrew",
+    "Emily", "Joshua", "Donna", "Kenneth", "Michelle", "Kevin", "Carol",
+    "Brian", "Amanda", "George", "Dorothy", "Timothy", "Melissa", "Ronald",
+    "Deborah", "Edward", "Stephanie", "Jason", "Rebecca", "Jeffrey", "Sharon",
+    "Ryan", "Laura", "Jacob", "Cynthia", "Gary", "Kathleen", "Nicholas", "Amy",
+    "Eric", "Angela", "Jonathan", "Shirley", "Stephen", "Anna", "Larry",
+    "Brenda", "Justin", "Pamela", "Scott", "Emma", "Brandon", "Nicole",
+    "Myrtle", "Flora", "Johnnie", "Cecilia", "Herman", "Gayle", "Bradley",
+)
+LAST_NAMES = (
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez",
+    "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark",
+    "Ramirez", "Lewis", "Robinson", "Walker", "Young", "Allen", "King",
+    "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores", "Green", "Adams",
+    "Nelson", "Baker", "Hall", "Rivera", "Campbell", "Mitchell", "Carter",
+    "Roberts", "Mayer", "Waters", "Konopelski-Lakin", "Lindgren", "Ortiz",
+    "Mayert", "Reynolds", "Bogisich", "Trantow", "Funk",
+)
+PREFIXES = ("Dr.", "Mr.", "Mrs.", "Ms.", "Miss")
+SUFFIXES = ("I", "II", "III", "IV", "V", "Jr.", "Sr.", "MD", "DDS", "PhD")
+DOMAINS = ("gmail.com", "yahoo.com", "hotmail.com", "outlook.com", "icloud.com")
+DOMAIN_WEIGHTS = (34, 30, 26, 7, 3)
+EMAIL_PATTERNS = ("{first}.{last}{n}", "{first}_{last}{n}", "{first}{n}", "{last}.{first}{n}")
+
+# Working-age heavy with a long tail, over the fixture's 1..120 range.
+AGES = tuple(range(1, 121))
+AGE_WEIGHTS = tuple(math.exp(-((age - 42) / 17) ** 2 / 2) + 0.01 for age in AGES)
+
+# Random draws are made in blocks of this size, so the output for a seed
+# never depends on how the caller consumes it.
+BLOCK = 10_000
+
+
+def generate_users(rows, seed=0):
+    """Generator yielding (name, email, age) tuples, reproducible per seed.
+
+    Every email carries the row number, so emails are unique and deterministic
+    ids derived from them (see seed.user_id_for) never collide.
+    """
+    rng = random.Random(seed)
+    produced = 0
+    while produced < rows:
+        count = min(BLOCK, rows - produced)
+        firsts = rng.choices(FIRST_NAMES, k=count)
+        lasts = rng.choices(LAST_NAMES, k=count)
+        domains = rng.choices(DOMAINS, weights=DOMAIN_WEIGHTS, k=count)
+        patterns = rng.choices(EMAIL_PATTERNS, k=count)
+        ages = rng.choices(AGES, weights=AGE_WEIGHTS, k=count)
+        decorations = [rng.random() for _ in range(count)]
+        for i in range(count):
+            first, last, decoration = firsts[i], lasts[i], decorations[i]
+            name = f"{first} {last}"
+            if decoration < 0.05:
+                name = f"{PREFIXES[int(decoration * 100)]} {name}"
+            elif decoration > 0.95:
+                name = f"{name} {SUFFIXES[int((decoration - 0.95) * 200)]}"
+            email = patterns[i].format(first=first, last=last, n=produced + i)
+            yield name, f"{email}@{domains[i]}", ages[i]
+        produced += count
+
+
+def write_csv(path, rows, seed=0):
+    """Stream `rows` synthetic users to a CSV shaped like user_data.csv."""
+    users = generate_users(rows, seed)
+    with open(path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL, lineterminator="\n")
+        writer.writerow(("name", "email", "age"))
+        while True:
+            block = [user for _, user in zip(range(BLOCK), users)]
+            if not block:
+                break
+            writer.writerows(block)
+
+
+def insert_users(connection, rows, seed=0, chunk_size=10_000):
+    """Insert `rows` synthetic users into user_data, one commit per chunk."""
+    import seed as seeder
+
+    rng = random.Random(seed)
+    records = (
+        (str(uuid.UUID(int=rng.getrandbits(128), version=4)), name, email, age)
+        for name, email, age in generate_users(rows, seed)
+    )
+    cursor = connection.cursor()
+    for chunk in seeder.chunked(records, chunk_size):
+        cursor.executemany(seeder.INSERT_QUERY, chunk)
+        connection.commit()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", nargs="?", help="CSV file to write")
+    parser.add_argument("rows", type=int, help="number of rows to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--insert", action="store_true",
+                        help="insert into ALX_prodev.user_data instead of writing a CSV")
+    args = parser.parse_args()
+
+    if args.insert:
+        import seed as seeder
+        connection = seeder.connect_to_prodev()
+        seeder.create_table(connection)
+        insert_users(connection, args.rows, args.seed)
+        connection.close()
+    elif args.output:
+        write_csv(args.output, args.rows, args.seed)
+    else:
+        parser.error("give an output file or --insert")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Module for testing the streaming group-by operator.
+"""
+import os
+import unittest
+
+from groupby import GroupBy, Count, Histogram, HyperLogLog, email_domain, group_by
+
+
+def batches(total, size=100):
+    """Yield batches of synthetic user rows."""
+    for start in range(0, total, size):
+        yield [{"email": f"user{i}@domain{i % 7}.com", "age": i % 90}
+               for i in range(start, min(start + size, total))]
+
+
+class TestGroupBy(unittest.TestCase):
+    """Tests for GroupBy and HyperLogLog"""
+
+    def test_histogram_by_domain(self):
+        """Test per-domain age histograms against a plain count"""
+        result = dict(group_by(batches(700), email_domain, Histogram("age", 30)))
+        self.assertEqual(len(result), 7)
+        self.assertEqual(sum(sum(h.values()) for h in result.values()), 700)
+        self.assertEqual(set(result["domain0.com"]), {0, 30, 60})
+
+    def test_spill_matches_in_memory(self):
+        """Test that spilling to disk gives the same groups and cleans up"""
+        in_memory = dict(group_by(batches(5000), "email", Count()))
+        grouping = GroupBy("email", Count(), max_groups=300, partitions=4)
+        for batch in batches(5000):
+            grouping.consume(batch)
+        workdir = grouping.workdir
+        self.assertGreater(grouping.spills, 1)
+        self.assertEqual(dict(grouping.results()), in_memory)
+        self.assertFalse(os.path.exists(workdir))
+
+    def test_oversized_partitions_are_split(self):
+        """Test many more distinct keys than max_groups * partitions"""
+        grouping = GroupBy("email", Count(), max_groups=50, partitions=4)
+        for batch in batches(3000):
+            grouping.consume(batch)
+            grouping.consume(batch[:10])
+        workdir = grouping.workdir
+        result = dict(grouping.results())
+        self.assertGreater(grouping.repartitions, 4)
+        self.assertEqual(len(result), 3000)
+        self.assertEqual(sum(result.values()), 3000 + 300)
+        self.assertFalse(os.path.exists(workdir))
+
+    def test_hyperloglog_estimate(self):
+        """Test distinct counts are within a few standard errors and merge"""
+        first = HyperLogLog(12).update(range(0, 60_000))
+        second = HyperLogLog(12).update(range(40_000, 100_000))
+        self.assertAlmostEqual(first.count(), 60_000, delta=60_000 * 0.05)
+        self.assertAlmostEqual(first.merge(second).count(), 100_000, delta=100_000 * 0.05)
+        self.assertEqual(HyperLogLog().update(["a", "b", "a"]).count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
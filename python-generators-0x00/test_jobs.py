@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Module for testing resumable batch jobs.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from contextlib import contextmanager
+from unittest.mock import patch, Mock
+
+from fanout import Consumer
+from jobs import BatchJob, CheckpointStore, SqliteSink
+
+TOTAL = 95
+
+
+class SqliteCursor:
+    """MySQL-style cursor stand-in running queries on a sqlite3 connection."""
+
+    def __init__(self, connection, dictionary):
+        self.connection = connection
+        self.dictionary = dictionary
+
+    def execute(self, sql, params):
+        self.cursor = self.connection.execute(sql.replace("%s", "?"), params)
+
+    def fetchmany(self, size):
+        rows = self.cursor.fetchmany(size)
+        if self.dictionary:
+            names = [column[0] for column in self.cursor.description]
+            rows = [dict(zip(names, row)) for row in rows]
+        return rows
+
+    def close(self):
+        pass
+
+
+def sqlite_pool(total):
+    """Build a pool mock serving a user_data table of `total` rows."""
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE user_data (user_id TEXT, name TEXT, email TEXT, age REAL)")
+    connection.executemany("INSERT INTO user_data VALUES (?, ?, ?, ?)", [
+        (f"{index:036d}", f"User {index}", f"user{index}@example.com", index % 90)
+        for index in range(total)])
+    mysql_connection = Mock()
+    mysql_connection.cursor.side_effect = lambda buffered=True, dictionary=False: (
+        SqliteCursor(connection, dictionary))
+
+    @contextmanager
+    def borrow():
+        yield mysql_connection
+
+    pool = Mock()
+    pool.connection.side_effect = borrow
+    return pool
+
+
+class Crash(Exception):
+    """Raised by the test consumers to simulate a crash mid-job."""
+
+
+class CountIds(Consumer):
+    """Counts rows, crashing on batch crash_at; state survives restarts."""
+
+    def __init__(self, crash_at=None):
+        self.crash_at = crash_at
+        self.batches = 0
+        self.rows = 0
+        self.seen = []
+
+    def consume(self, batch):
+        self.batches += 1
+        if self.batches == self.crash_at:
+            raise Crash()
+        self.rows += len(batch)
+        self.seen.extend(row["user_id"] for row in batch)
+
+    def finish(self):
+        return self.rows
+
+    def get_state(self):
+        return {"rows": self.rows}
+
+    def set_state(self, state):
+        self.rows = state["rows"]
+
+
+class CrashingSink(SqliteSink):
+    """SqliteSink crashing on batch crash_at, after writing part of it."""
+
+    def __init__(self, path, crash_at):
+        super().__init__(path)
+        self.crash_at = crash_at
+        self.batches = 0
+
+    def consume(self, batch):
+        self.batches += 1
+        if self.batches == self.crash_at:
+            super().consume(batch[:3])
+            raise Crash()
+        super().consume(batch)
+
+
+class TestBatchJob(unittest.TestCase):
+    """Tests BatchJob checkpoints against a sqlite-backed pool"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        patcher = patch("query.get_pool", return_value=sqlite_pool(TOTAL))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = CheckpointStore(os.path.join(self.tmp, "checkpoints.db"))
+        self.addCleanup(self.store.close)
+
+    def test_resume_after_last_checkpoint(self):
+        """Test that a restarted job resumes after the saved key and state"""
+        first = CountIds(crash_at=5)
+        job = BatchJob("count", first, batch_size=10, checkpoint_every=2, store=self.store)
+        with self.assertRaises(Crash):
+            job.run()
+        last_key, state = self.store.load("count")
+        self.assertEqual(last_key, first.seen[39])
+        self.assertEqual(state, {"rows": 40})
+
+        second = CountIds()
+        job = BatchJob("count", second, batch_size=10, checkpoint_every=2, store=self.store)
+        self.assertEqual(job.run(), TOTAL)
+        self.assertEqual(second.seen[0], f"{40:036d}")
+        self.assertEqual(len(second.seen), TOTAL - 40)
+        self.assertEqual(self.store.load("count"), (None, None))
+
+    def test_exactly_once_rolls_back_partial_batches(self):
+        """Test that a crashed exactly-once job keeps only committed rows"""
+        path = os.path.join(self.tmp, "sink.db")
+        job = BatchJob("copy", CrashingSink(path, crash_at=6), batch_size=10,
+                       checkpoint_every=2, store=self.store, exactly_once=True)
+        with self.assertRaises(Crash):
+            job.run()
+        sink = SqliteSink(path)
+        self.assertEqual(sink.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0], 40)
+        self.assertEqual(sink.checkpoint(), f"{39:036d}")
+
+        BatchJob("copy", sink, batch_size=10, checkpoint_every=2,
+                 store=self.store, exactly_once=True).run()
+        with sqlite3.connect(path) as conn:
+            ids = [row[0] for row in conn.execute("SELECT user_id FROM users ORDER BY user_id")]
+        self.assertEqual(ids, [f"{index:036d}" for index in range(TOTAL)])
+
+    def test_exactly_once_needs_a_sink(self):
+        """Test that exactly_once rejects consumers without commit()"""
+        with self.assertRaises(ValueError):
+            BatchJob("bad", CountIds(), store=self.store, exactly_once=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
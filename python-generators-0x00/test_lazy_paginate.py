@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Module for testing keyset pagination cursors.
+"""
+import unittest
+
+lazy_paginate = __import__('2-lazy_paginate')
+
+
+class TestCursors(unittest.TestCase):
+    """Tests for cursor tokens and seek keys"""
+
+    def test_round_trip(self):
+        """Test that a cursor decodes to the key and values it encoded"""
+        for key, after in (("user_id", ["00a1"]), ("age", [42.5, "00a1"]),
+                           ("email", ["a+b@example.com", "00a1"]), ("seq", [7])):
+            token = lazy_paginate.encode_cursor(key, after)
+            self.assertEqual(lazy_paginate.decode_cursor(token), (key, after))
+
+    def test_invalid_token(self):
+        """Test that malformed tokens raise ValueError"""
+        for token in ("not a token", "e30=", lazy_paginate.encode_cursor("age", [1])[:-4]):
+            with self.assertRaises(ValueError):
+                lazy_paginate.decode_cursor(token)
+
+    def test_key_mismatch(self):
+        """Test that a cursor issued for another key is refused"""
+        token = lazy_paginate.encode_cursor("age", [40, "00a1"])
+        with self.assertRaises(ValueError) as raised:
+            next(lazy_paginate.lazy_paginate_keyset(10, token, key="email"))
+        self.assertIn("age", str(raised.exception))
+
+    def test_seek_columns(self):
+        """Test that non-unique keys get user_id as a tie-breaker"""
+        self.assertEqual(lazy_paginate.seek_columns("seq"), ("seq",))
+        self.assertEqual(lazy_paginate.seek_columns("age"), ("age", "user_id"))
+        with self.assertRaises(ValueError):
+            lazy_paginate.seek_columns("password")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Module for testing the background prefetching adapter.
+"""
+import threading
+import unittest
+from itertools import islice
+
+from prefetch import prefetch
+
+
+class Source:
+    """Iterator that records how far it was read and whether it was closed."""
+
+    def __init__(self, total=1000, fail_at=None):
+        self.total = total
+        self.fail_at = fail_at
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.produced == self.fail_at:
+            raise KeyError("source failed")
+        if self.produced == self.total:
+            raise StopIteration
+        self.produced += 1
+        return self.produced
+
+    def close(self):
+        self.closed.set()
+
+
+class TestPrefetch(unittest.TestCase):
+    """Tests for prefetch"""
+
+    def test_yields_everything_in_order(self):
+        """Test that prefetching does not reorder or drop items"""
+        source = Source(100)
+        self.assertEqual(list(prefetch(source, depth=3)), list(range(1, 101)))
+        self.assertTrue(source.closed.is_set())
+
+    def test_break_closes_source(self):
+        """Test that an early break stops reading and closes the source"""
+        source = Source()
+        stream = prefetch(source, depth=2)
+        for item in stream:
+            if item == 5:
+                break
+        stream.close()
+        self.assertTrue(source.closed.is_set())
+        self.assertLessEqual(source.produced, 5 + 2 + 1)
+
+    def test_islice_closes_source(self):
+        """Test that an exhausted islice closes the source once released"""
+        source = Source()
+        stream = prefetch(source)
+        self.assertEqual(list(islice(stream, 3)), [1, 2, 3])
+        del stream
+        self.assertTrue(source.closed.wait(5))
+        self.assertLess(source.produced, 1000)
+
+    def test_exceptions_propagate(self):
+        """Test that a failure in the source reaches the consumer"""
+        source = Source(fail_at=10)
+        seen = []
+        with self.assertRaises(KeyError):
+            for item in prefetch(source):
+                seen.append(item)
+        self.assertEqual(seen, list(range(1, 11)))
+        self.assertTrue(source.closed.is_set())
+
+    def test_depth_must_be_positive(self):
+        """Test that depth below 1 is rejected"""
+        with self.assertRaises(ValueError):
+            next(prefetch([], depth=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Module for testing the EXPLAIN-based plan checker.
+"""
+import unittest
+
+import mysql.connector
+
+import query_plans
+from pool import get_pool
+
+
+def database_available():
+    """Return True if the configured MySQL server can be reached."""
+    try:
+        with get_pool().connection():
+            return True
+    except mysql.connector.Error:
+        return False
+
+
+class TestProblemsIn(unittest.TestCase):
+    """Tests for judging single EXPLAIN plans"""
+
+    def test_seek_rejects_full_scan_and_filesort(self):
+        """Test that full scans and sorts fail a seek expectation"""
+        plan = [{"type": "ALL", "key": None, "Extra": "Using where; Using filesort"}]
+        self.assertEqual(len(query_plans.problems_in(plan, "seek")), 2)
+        plan = [{"type": "range", "key": "PRIMARY", "Extra": "Using where"}]
+        self.assertEqual(query_plans.problems_in(plan, "seek"), [])
+
+    def test_covering_and_scan(self):
+        """Test covering index detection and that scans are never flagged"""
+        plan = [{"type": "index", "key": "idx_age", "Extra": "Using index"}]
+        self.assertEqual(query_plans.problems_in(plan, "covering"), [])
+        plan = [{"type": "ALL", "key": None, "Extra": None}]
+        self.assertTrue(query_plans.problems_in(plan, "covering"))
+        self.assertEqual(query_plans.problems_in(plan, "scan"), [])
+
+
+class TestKeysetQuery(unittest.TestCase):
+    """Tests for the SQL the keyset pages seek with"""
+
+    def test_composite_seek_has_leading_bound(self):
+        """Test that composite seeks bound the leading index column"""
+        lazy_paginate = __import__('2-lazy_paginate')
+        sql, params = lazy_paginate.keyset_query(10, [40, "u"], "age").build()
+        self.assertIn("age >= %s AND (age, user_id) > (%s, %s)", sql)
+        self.assertEqual(params, (40, 40, "u", 10))
+
+    def test_single_column_seek(self):
+        """Test that unique keys seek with a plain comparison"""
+        lazy_paginate = __import__('2-lazy_paginate')
+        sql, params = lazy_paginate.keyset_query(10, [7], "seq").build()
+        self.assertIn("WHERE seq > %s ORDER BY seq", sql)
+        self.assertEqual(params, (7, 10))
+
+
+@unittest.skipUnless(database_available(), "needs a seeded ALX_prodev database")
+class TestGeneratorPlans(unittest.TestCase):
+    """Tests the real plans of every generator query"""
+
+    def test_no_plan_regressions(self):
+        """Test that no selective generator query falls back to a full scan"""
+        failures = [(r["name"], r["problems"]) for r in query_plans.check_plans()
+                    if r["problems"]]
+        self.assertEqual(failures, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
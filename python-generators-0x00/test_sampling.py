@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Module for testing reservoir sampling and sample-based estimates.
+"""
+import math
+import random
+import unittest
+from collections import Counter
+
+from sampling import estimate_count, estimate_mean, reservoir_sample
+from stats import StreamingStats
+
+
+class TestReservoirSample(unittest.TestCase):
+    """Tests for reservoir_sample"""
+
+    def test_uniform(self):
+        """Test that every item is kept about k/n of the time"""
+        trials, n, k = 4000, 20, 5
+        counts = Counter()
+        for seed in range(trials):
+            sample = reservoir_sample(range(n), k, seed)
+            self.assertEqual(len(set(sample)), k)
+            counts.update(sample)
+        expected = trials * k / n
+        spread = 5 * math.sqrt(expected * (1 - k / n))
+        for item in range(n):
+            self.assertAlmostEqual(counts[item], expected, delta=spread)
+
+    def test_long_stream_keeps_late_items(self):
+        """Test that skipping ahead still reaches the end of long streams"""
+        counts = Counter()
+        for seed in range(300):
+            counts.update(item // 1000 for item in reservoir_sample(range(10_000), 10, seed))
+        self.assertAlmostEqual(counts[0], counts[9], delta=120)
+        self.assertEqual(sum(counts.values()), 3000)
+
+    def test_short_streams(self):
+        """Test k >= n returns everything, k = 0 nothing, k < 0 an error"""
+        self.assertEqual(reservoir_sample(iter(range(3)), 5), [0, 1, 2])
+        self.assertEqual(reservoir_sample(range(3), 3), [0, 1, 2])
+        self.assertEqual(reservoir_sample(range(3), 0), [])
+        with self.assertRaises(ValueError):
+            reservoir_sample(range(3), -1)
+
+
+class TestEstimates(unittest.TestCase):
+    """Tests for estimate_count and estimate_mean"""
+
+    def test_estimate_count(self):
+        """Test the scaled-up count and that its interval is sensible"""
+        result = estimate_count(100, 0.1)
+        self.assertEqual(result["estimate"], 1000)
+        self.assertAlmostEqual(result["stderr"], math.sqrt(90) / 0.1)
+        self.assertLess(result["low"], 1000)
+        self.assertGreater(result["high"], 1000)
+        self.assertEqual(estimate_count(3, 0.001)["low"], 3)
+        with self.assertRaises(ValueError):
+            estimate_count(100, 0.1, confidence=1)
+
+    def test_estimate_mean(self):
+        """Test the interval width and the finite population correction"""
+        rng = random.Random(3)
+        stats = StreamingStats().update(rng.gauss(50, 10) for _ in range(400))
+        result = estimate_mean(stats)
+        self.assertAlmostEqual(result["stderr"], math.sqrt(stats.variance / 400))
+        self.assertLess(result["low"], 50)
+        self.assertGreater(result["high"], 50)
+        self.assertEqual(estimate_mean(stats, fraction=1)["stderr"], 0)
+        self.assertIsNone(estimate_mean(StreamingStats())["estimate"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Module for testing the CSV splitting behind parallel ingest.
+"""
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+# seed.py reads DATABASE_URL on import; splitting never connects.
+os.environ.setdefault("DATABASE_URL", "mysql://localhost/ALX_prodev")
+import seed
+
+HEADER = b"name,email,age\n"
+BLOCK = 1 << 20
+
+
+def row(index, name=None):
+    """Return one CSV record whose quoted name spans two lines."""
+    name = name or f'{index} first line\nsecond ""quoted"" line'.encode()
+    return b'"' + name + b'",user%d@example.com,%d\n' % (index, index % 90)
+
+
+def write_csv(path, total_bytes):
+    """Write a CSV where a quoted newline ends each split_csv read block.
+
+    Every record has a quoted newline; the record crossing each block edge
+    is padded so that its newline is the last byte of the block.
+    """
+    data = bytearray(HEADER)
+    edge = len(HEADER) + BLOCK
+    index = 0
+    while len(data) < total_bytes:
+        record = row(index)
+        if len(data) + len(record) + 200 > edge:
+            padding = edge - len(data) - 2
+            record = row(index, b"x" * padding + b'\ntail ""quoted""')
+            edge += BLOCK
+        data += record
+        index += 1
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class TestSplitCsv(unittest.TestCase):
+    """Tests split_csv and parse_chunk on quoted newlines"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.tmp, "users.csv")
+        write_csv(cls.path, 2 * BLOCK + 4096)
+        with open(cls.path, newline="") as f:
+            cls.expected = [(seed.user_id_for(r["email"]), r["name"].strip(), r["email"],
+                             float(r["age"])) for r in csv.DictReader(f)]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp)
+
+    def test_chunks_hold_whole_records(self):
+        """Test that no range splits a quoted field across block edges"""
+        # 1000 puts a boundary search right before each block edge; BLOCK - 5
+        # starts the first search inside the padded field.
+        for chunk_bytes in (1000, BLOCK - 5, 10 * BLOCK):
+            with self.subTest(chunk_bytes=chunk_bytes):
+                header, ranges = seed.split_csv(self.path, chunk_bytes)
+                self.assertEqual(header, ["name", "email", "age"])
+                self.assertEqual(ranges[0][0], len(HEADER))
+                self.assertEqual(ranges[-1][1], os.path.getsize(self.path))
+                records = []
+                for start, end in ranges:
+                    chunk, rejected = seed.parse_chunk(self.path, start, end, header, True)
+                    self.assertEqual(rejected, 0)
+                    records.extend(chunk)
+                self.assertEqual(records, self.expected)
+
+    def test_edge_record_is_intact(self):
+        """Test that the padded records really straddle the block edges"""
+        padded = [r for r in self.expected if r[1].startswith("xxx")]
+        self.assertEqual(len(padded), 2)
+        self.assertTrue(all(r[1].endswith('\ntail "quoted"') for r in padded))
+
+
+if __name__ == '__main__':
+    unittest.main()
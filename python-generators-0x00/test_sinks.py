@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Module for testing the buffered output sinks.
+"""
+import io
+import os
+import csv
+import json
+import shutil
+import tempfile
+import unittest
+
+from sinks import ColumnarSink, CsvSink, NdjsonSink, read_columnar
+
+
+def users(start, count):
+    """Build a batch of dict rows, with awkward characters in the names."""
+    return [{"user_id": f"id-{i}", "name": f'User "{i}", Jr.\nline two' if i % 2 else f"Ünï {i}",
+             "email": f"user{i}@example.com", "age": i % 90 + 0.5}
+            for i in range(start, start + count)]
+
+
+class TestSinks(unittest.TestCase):
+    """Tests for NdjsonSink, CsvSink and ColumnarSink"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def test_columnar_round_trip(self):
+        """Test that read_columnar returns the blocks ColumnarSink wrote"""
+        path = os.path.join(self.tmp, "users.udc")
+        sink = ColumnarSink(path, flush_rows=4)
+        batches = [users(0, 3), users(3, 5), users(8, 1)]
+        for batch in batches:
+            sink.write(batch)
+        self.assertEqual(sink.finish(), 9)
+        blocks = list(read_columnar(path))
+        self.assertEqual(len(blocks), len(batches))
+        for block, batch in zip(blocks, batches):
+            self.assertEqual(block, {name: [row[name] for row in batch] for name in batch[0]})
+
+    def test_columnar_rejects_other_files(self):
+        """Test that files without the magic bytes are refused"""
+        path = os.path.join(self.tmp, "other.udc")
+        with open(path, "wb") as f:
+            f.write(b"nope")
+        with self.assertRaises(ValueError):
+            list(read_columnar(path))
+
+    def test_csv_quoting(self):
+        """Test that commas, quotes and newlines survive a CSV round trip"""
+        stream = io.StringIO()
+        sink = CsvSink(stream=stream, flush_rows=2)
+        sink.write(users(0, 5))
+        sink.finish()
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue(), newline="")))
+        self.assertEqual([row["name"] for row in rows], [u["name"] for u in users(0, 5)])
+        self.assertEqual(rows[1]["age"], "1.5")
+
+    def test_ndjson_lines(self):
+        """Test one JSON object per row, written only once flushed"""
+        stream = io.StringIO()
+        sink = NdjsonSink(stream=stream, flush_rows=10)
+        sink.write(users(0, 4))
+        self.assertEqual(stream.getvalue(), "")
+        sink.finish()
+        self.assertEqual([json.loads(line) for line in stream.getvalue().splitlines()],
+                         users(0, 4))
+
+    def test_broken_pipe_sets_flag(self):
+        """Test that a closed reader sets broken_pipe and drops later output"""
+        class ClosedPipe(io.StringIO):
+            def write(self, data):
+                raise BrokenPipeError()
+
+        sink = NdjsonSink(stream=ClosedPipe(), flush_rows=1)
+        sink.write(users(0, 2))
+        self.assertTrue(sink.broken_pipe)
+        sink.write(users(2, 2))
+        self.assertEqual(sink.chunks, [])
+        self.assertEqual(sink.finish(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
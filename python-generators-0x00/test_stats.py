@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Module for testing the mergeable statistics engine.
+"""
+import json
+import random
+import statistics
+import unittest
+
+from stats import QuantileSketch, StreamingStats
+
+
+class TestStreamingStats(unittest.TestCase):
+    """Tests for StreamingStats and QuantileSketch"""
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [rng.uniform(18, 90) for _ in range(5000)]
+
+    def test_merge_matches_single_pass(self):
+        """Test that merged partitions equal one pass over every value"""
+        parts = [StreamingStats().update(self.values[i::3]) for i in range(3)]
+        merged = parts[0].merge(parts[1]).merge(parts[2])
+        self.assertEqual(merged.count, len(self.values))
+        self.assertAlmostEqual(merged.mean, statistics.fmean(self.values))
+        self.assertAlmostEqual(merged.variance, statistics.variance(self.values))
+        self.assertEqual((merged.min, merged.max), (min(self.values), max(self.values)))
+        self.assertEqual(StreamingStats().merge(StreamingStats()).count, 0)
+
+    def test_quantiles_within_relative_accuracy(self):
+        """Test sketch quantiles against exact ones"""
+        sketch = QuantileSketch(0.01)
+        for value in self.values:
+            sketch.add(value)
+        ordered = sorted(self.values)
+        for q in (0.1, 0.5, 0.9, 0.99):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            self.assertAlmostEqual(sketch.quantile(q), exact, delta=exact * 0.02)
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+    def test_sketch_round_trip_and_merge(self):
+        """Test that sketches survive JSON and merge like one sketch"""
+        first, second, whole = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for index, value in enumerate([-3.0, 0.0, *self.values]):
+            (first if index % 2 else second).add(value)
+            whole.add(value)
+        restored = QuantileSketch.from_dict(json.loads(json.dumps(first.to_dict())))
+        self.assertEqual(restored.count, first.count)
+        restored.merge(second)
+        for q in (0, 0.25, 0.5, 0.75, 1):
+            self.assertEqual(restored.quantile(q), whole.quantile(q))
+        with self.assertRaises(ValueError):
+            restored.merge(QuantileSketch(0.05))
+
+    def test_stats_round_trip(self):
+        """Test that StreamingStats survive to_dict and from_dict"""
+        stats = StreamingStats().update(self.values)
+        restored = StreamingStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+        self.assertEqual(restored.summary(), stats.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Module for testing the stream_users generator.
+"""
+import gc
+import unittest
+import tracemalloc
+from contextlib import contextmanager
+from unittest.mock import patch, Mock
+
+import query
+
+stream_module = __import__('0-stream_users')
+
+
+class FakeCursor:
+    """Unbuffered cursor stand-in that builds rows only when fetched."""
+
+    def __init__(self, total, dictionary):
+        self.total = total
+        self.dictionary = dictionary
+        self.position = 0
+
+    def execute(self, sql, params):
+        self.sql = sql
+
+    def fetchmany(self, size):
+        rows = []
+        for index in range(self.position, min(self.position + size, self.total)):
+            row = (f"{index:036d}", f"User {index}", f"user{index}@example.com", 30)
+            if self.dictionary:
+                row = dict(zip(("user_id", "name", "email", "age"), row))
+            rows.append(row)
+        self.position += len(rows)
+        return rows
+
+    def close(self):
+        pass
+
+
+def fake_pool(total):
+    """Build a pool mock whose connection serves `total` rows."""
+    connection = Mock()
+    connection.cursor.side_effect = lambda buffered, dictionary: FakeCursor(
+        total, dictionary)
+
+    @contextmanager
+    def borrow():
+        yield connection
+
+    pool = Mock()
+    pool.connection.side_effect = borrow
+    return pool, connection
+
+
+class TestStreamUsers(unittest.TestCase):
+    """Tests for the unbuffered stream_users generator"""
+
+    def stream(self, total, **kwargs):
+        pool, connection = fake_pool(total)
+        with patch.object(query, "get_pool", return_value=pool):
+            yield from stream_module.stream_users(**kwargs)
+
+    def peak_memory(self, total):
+        gc.collect()
+        tracemalloc.start()
+        for _ in self.stream(total, fetch_size=100):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    def test_uses_unbuffered_cursor(self):
+        """Test that the cursor is requested unbuffered"""
+        pool, connection = fake_pool(3)
+        with patch.object(query, "get_pool", return_value=pool):
+            rows = list(stream_module.stream_users(fetch_size=2))
+        connection.cursor.assert_called_once_with(buffered=False, dictionary=True)
+        self.assertEqual(len(rows), 3)
+
+    def test_row_formats(self):
+        """Test dict and tuple row output"""
+        row = next(self.stream(1))
+        self.assertEqual(row["name"], "User 0")
+        row = next(self.stream(1, row_format="tuple"))
+        self.assertEqual(row[1], "User 0")
+
+    def test_invalid_arguments(self):
+        """Test that bad row formats and fetch sizes are rejected"""
+        with self.assertRaises(ValueError):
+            next(stream_module.stream_users(row_format="list"))
+        with self.assertRaises(ValueError):
+            next(stream_module.stream_users(fetch_size=0))
+
+    def test_peak_memory_is_flat(self):
+        """Test that peak memory does not grow with the number of rows"""
+        small = self.peak_memory(10_000)
+        large = self.peak_memory(200_000)
+        self.assertLess(large, small * 1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()